@@ -0,0 +1,215 @@
+"""
+Content-addressed store for files ingested from the Inbox.
+Each distinct payload is kept once under .blobs/ (hidden from Obsidian),
+named by its sha256, and placed into Needs_Action as a reflink (a
+copy-on-write clone) or a hard link where the filesystem allows, with a
+plain copy as the last resort. Later moves, like Needs_Action -> Done,
+are renames and never copy data.
+
+Hard-linked payloads share one inode, so the blob is made read-only:
+an editor cannot change every linked task at once by writing in place.
+Text and markdown payloads are documents the user edits, so they are
+never hard-linked; they get a clone or a writable copy of their own.
+Task metadata is never written through a link (see write_document).
+
+The orchestrator and filesystem_watcher both ingest into the same store,
+so the references live in SQLite (.blobs/index.db), and placing or
+removing a blob happens inside a write transaction that serializes the
+processes.
+"""
+
+import os
+import sys
+import json
+import errno
+import shutil
+import sqlite3
+import logging
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+from ingest_journal import file_digest
+
+logger = logging.getLogger("BlobStore")
+
+# ioctl that clones a file's extents (btrfs, XFS, bcachefs)
+FICLONE = 0x40049409
+
+
+def _reflink(source: Path, dest: Path):
+    if not sys.platform.startswith("linux"):
+        return False
+    import fcntl
+    try:
+        with open(source, "rb") as src, open(dest, "xb") as dst:
+            fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+        return True
+    except OSError as e:
+        if dest.exists():
+            dest.unlink()
+        if e.errno not in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+            raise
+        return False
+
+
+# Payloads users open and save in place; they never share an inode
+EDITABLE_SUFFIXES = {".md", ".markdown", ".txt"}
+
+
+class BlobStore:
+    """Hash-addressed payloads with their references in .blobs/index.db."""
+
+    def __init__(self, vault_path: Path, root: Path = None):
+        self.vault_path = Path(vault_path).resolve()
+        self.root = root or self.vault_path / ".blobs"
+        self.root.mkdir(parents=True, exist_ok=True)
+        self.db_path = self.root / "index.db"
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS refs (digest TEXT NOT NULL, ref TEXT NOT NULL, "
+                         "PRIMARY KEY (digest, ref))")
+        self._import_json_index()
+
+    def _connect(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    @contextmanager
+    def _write(self):
+        """A write transaction; SQLite's write lock doubles as the store's lock across processes."""
+        conn = self._connect()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _import_json_index(self):
+        # Stores written before the SQLite index kept their references in index.json
+        json_path = self.root / "index.json"
+        try:
+            with open(json_path, encoding="utf-8") as f:
+                index = json.load(f)
+        except FileNotFoundError:
+            return
+        except ValueError as e:
+            logger.error(f"Old blob index unreadable, relying on the blob scan: {e}")
+            index = {}
+        with self._write() as conn:
+            conn.executemany("INSERT OR IGNORE INTO refs (digest, ref) VALUES (?, ?)",
+                             [(digest, ref) for digest, entry in index.items() for ref in entry.get("refs", [])])
+        json_path.unlink(missing_ok=True)
+
+    def blob_path(self, digest: str):
+        return self.root / digest[:2] / digest
+
+    def _ref(self, path: Path):
+        return Path(path).resolve().relative_to(self.vault_path).as_posix()
+
+    def ingest(self, source: Path, dest: Path, consume: bool = True, digest: str = None):
+        """Places source's content at dest, storing it once; returns the digest.
+
+        With consume, source is moved into the store (or removed when the
+        content is already stored) instead of being left behind. Pass digest
+        when the caller already hashed source.
+        """
+        digest = digest or file_digest(source)
+        blob = self.blob_path(digest)
+        with self._write() as conn:
+            if not blob.exists():
+                blob.parent.mkdir(exist_ok=True)
+                tmp_path = blob.with_name(f".{digest}.tmp")
+                if consume:
+                    try:
+                        os.replace(source, tmp_path)
+                    except OSError:
+                        # Other filesystem: fall back to a copy
+                        shutil.copy2(source, tmp_path)
+                        source.unlink()
+                else:
+                    shutil.copy2(source, tmp_path)
+                if os.name != "nt":
+                    # Windows refuses to delete read-only files, so only protect blobs elsewhere
+                    os.chmod(tmp_path, 0o444)
+                os.replace(tmp_path, blob)
+            elif consume:
+                source.unlink(missing_ok=True)
+
+            mode = self._place(blob, dest)
+            conn.execute("INSERT OR IGNORE INTO refs (digest, ref) VALUES (?, ?)", (digest, self._ref(dest)))
+        logger.info(f"Stored {dest.name} as {mode} of blob {digest[:12]}")
+        return digest
+
+    def _place(self, blob: Path, dest: Path):
+        if dest.exists():
+            dest.unlink()
+        if _reflink(blob, dest):
+            os.chmod(dest, 0o644)
+            return "reflink"
+        if dest.suffix.lower() not in EDITABLE_SUFFIXES:
+            try:
+                os.link(blob, dest)
+                return "hardlink"
+            except OSError:
+                pass
+        shutil.copy2(blob, dest)
+        os.chmod(dest, 0o644)
+        return "copy"
+
+    def _alive(self, ref: str):
+        path = self.vault_path / ref
+        # Tasks keep their name when they move from Needs_Action to Done
+        return path.exists() or (self.vault_path / "Done" / path.name).exists()
+
+    def _refs(self, conn, digest: str):
+        return [row[0] for row in conn.execute("SELECT ref FROM refs WHERE digest = ?", (digest,))]
+
+    def refcount(self, digest: str):
+        blob = self.blob_path(digest)
+        try:
+            links = blob.stat().st_nlink - 1
+        except FileNotFoundError:
+            return 0
+        refs = self._refs(self._connect(), digest)
+        return max(links, sum(1 for ref in refs if self._alive(ref)))
+
+    def _blobs(self):
+        """Digests of every blob on disk, whoever stored it."""
+        for shard in self.root.iterdir():
+            if len(shard.name) != 2 or not shard.is_dir():
+                continue
+            for entry in shard.iterdir():
+                if not entry.name.startswith("."):
+                    yield entry.name
+
+    def gc(self):
+        """Removes blobs no task refers to any more; returns the bytes freed."""
+        freed = 0
+        with self._write() as conn:
+            # Blobs are found by scanning .blobs/, so one missing from the index is still collected
+            for digest in set(self._blobs()) | {row[0] for row in conn.execute("SELECT DISTINCT digest FROM refs")}:
+                blob = self.blob_path(digest)
+                dead = [ref for ref in self._refs(conn, digest) if not self._alive(ref)]
+                conn.executemany("DELETE FROM refs WHERE digest = ? AND ref = ?", [(digest, ref) for ref in dead])
+                try:
+                    stat = blob.stat()
+                except FileNotFoundError:
+                    conn.execute("DELETE FROM refs WHERE digest = ?", (digest,))
+                    continue
+                if stat.st_nlink > 1 or self._refs(conn, digest):
+                    continue
+                os.chmod(blob, 0o644)
+                blob.unlink()
+                freed += stat.st_size
+        if freed:
+            logger.info(f"Blob store freed {freed} bytes")
+        return freed
+
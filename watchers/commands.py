@@ -0,0 +1,118 @@
+"""
+Command router for Inbox files and dashboard chat messages.
+Commands are recognized by their leading keyword at the start of one of
+the first lines of a message. All keywords are compiled once into a
+single alternation, so each line costs one regex match however many
+commands are registered; only the matched command's argument pattern is
+run after that.
+"""
+
+import re
+import logging
+from collections import namedtuple
+
+logger = logging.getLogger("Commands")
+
+# Commands must start on one of the first lines of a message
+COMMAND_LINES = 5
+
+# name -> (keyword, arguments): keyword is matched at the start of a line,
+# arguments right after it on the same line
+COMMANDS = {
+    "send_mail": (
+        r"(?:write|send)\s+(?:an?\s+)?(?:e-?)?mail\s+to\b",
+        r"\s*(?:(?P<recipient>[\w.+-]+@[\w.-]+\.\w+)\s*:?|(?P<name>[^:]+?)\s*:)\s*(?P<message>.*)",
+    ),
+    "schedule": (
+        r"schedule\b",
+        # "schedule <what>" or "schedule: <what>"; <what> must start with a word
+        r"(?:\s*:\s*|\s+)(?P<what>\w.*?)(?:\s+(?:on|at|for)\s+(?P<when>.+))?$",
+    ),
+    "summarize": (
+        r"summari[sz]e\b",
+        r"\s*(?P<what>.*)$",
+    ),
+}
+
+# body: the text after the command line, up to the next command
+Command = namedtuple("Command", ["name", "args", "body"])
+
+
+class CommandRouter:
+    """Registry of commands compiled into one pattern, dispatching to handlers."""
+
+    def __init__(self, commands: dict = None, max_lines: int = COMMAND_LINES):
+        self.max_lines = max_lines
+        self._keywords = {}
+        self._arguments = {}
+        self._handlers = {}
+        self._names = {}
+        self._pattern = None
+        for name, (keyword, arguments) in (COMMANDS if commands is None else commands).items():
+            self.register(name, keyword, arguments)
+
+    def register(self, name: str, keyword: str, arguments: str = r".*", handler=None):
+        self._keywords[name] = keyword
+        self._arguments[name] = re.compile(arguments, re.IGNORECASE)
+        if handler is not None:
+            self._handlers[name] = handler
+        self._pattern = None
+
+    def on(self, name: str, handler):
+        """Sets the handler for a registered command: handler(command, path) -> True if done."""
+        if name not in self._keywords:
+            raise KeyError(f"Unknown command: {name}")
+        self._handlers[name] = handler
+
+    def _compiled(self):
+        if self._pattern is None:
+            self._names = {f"c{i}": name for i, name in enumerate(self._keywords)}
+            alternation = "|".join(f"(?P<{group}>{self._keywords[name]})" for group, name in self._names.items())
+            # Quote and bullet markers may precede a command; headings are titles, not commands
+            self._pattern = re.compile(rf"[ \t>*-]*(?:{alternation})", re.IGNORECASE)
+        return self._pattern
+
+    def parse(self, text: str):
+        """Commands found at the start of the first max_lines non-empty lines, in order."""
+        pattern = self._compiled()
+        lines = text.splitlines()
+        found = []  # (line index, name, args)
+        seen = 0
+        for index, line in enumerate(lines):
+            if not line.strip():
+                continue
+            seen += 1
+            if seen > self.max_lines:
+                break
+            match = pattern.match(line)
+            if not match:
+                continue
+            name = self._names[match.lastgroup]
+            arguments = self._arguments[name].match(line, match.end())
+            if arguments is None:
+                logger.warning(f"Malformed {name} command: {line.strip()[:80]}")
+                continue
+            args = {k: v.strip() for k, v in arguments.groupdict().items() if v}
+            found.append((index, name, args))
+
+        commands = []
+        for i, (index, name, args) in enumerate(found):
+            end = found[i + 1][0] if i + 1 < len(found) else len(lines)
+            commands.append(Command(name, args, "\n".join(lines[index + 1:end]).strip()))
+        return commands
+
+    def dispatch(self, commands, path):
+        """Runs each command's handler; True only if every command was carried out."""
+        done = bool(commands)
+        for command in commands:
+            handler = self._handlers.get(command.name)
+            if handler is None:
+                logger.warning(f"No handler for command {command.name}")
+                done = False
+                continue
+            try:
+                done = bool(handler(command, path)) and done
+            except Exception as e:
+                logger.error(f"Command {command.name} failed for {path.name}: {e}")
+                done = False
+        return done
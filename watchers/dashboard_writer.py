@@ -0,0 +1,88 @@
+"""
+Single writer for the metrics table in Dashboard.md.
+Workers only queue metric deltas; they are summed over a short window and
+applied in one render, written to a temp file and swapped in with
+os.replace, so Obsidian never sees a half-written dashboard and a burst
+of events costs a handful of writes instead of one per event.
+"""
+
+import os
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("DashboardWriter")
+
+
+def render_metrics(content: str, values: dict):
+    """Applies {metric: delta} to the '| **Metric** | status | N ... |' rows of content."""
+    lines = content.splitlines(keepends=True)
+    for i, line in enumerate(lines):
+        for metric, delta in values.items():
+            if f"**{metric}**" not in line:
+                continue
+            parts = line.split("|")
+            if len(parts) < 4:
+                continue
+            current_val = int(''.join(filter(str.isdigit, parts[3])) or 0)
+            new_val = max(0, current_val + delta)
+            parts[3] = f" {new_val} in `/Needs_Action` "
+            lines[i] = "|".join(parts)
+    return "".join(lines)
+
+
+class DashboardWriter:
+    """Coalesces metric deltas and rewrites Dashboard.md atomically."""
+
+    def __init__(self, dashboard_path: Path, delay: float = 0.5):
+        self.dashboard_path = dashboard_path
+        self.delay = delay
+        self.writes = 0
+        self._deltas = {}
+        self._timer = None
+        self._lock = threading.Lock()
+        self._write_lock = threading.Lock()
+
+    def add(self, metric: str, delta: int):
+        """Queues a change; it is written within `delay` seconds."""
+        if not delta:
+            return
+        with self._lock:
+            self._deltas[metric] = self._deltas.get(metric, 0) + delta
+            if self._timer is None:
+                self._timer = threading.Timer(self.delay, self.flush)
+                self._timer.daemon = True
+                self._timer.start()
+
+    def flush(self):
+        """Writes all queued deltas now."""
+        with self._write_lock:
+            with self._lock:
+                deltas, self._deltas = self._deltas, {}
+                if self._timer is not None:
+                    self._timer.cancel()
+                    self._timer = None
+            deltas = {metric: delta for metric, delta in deltas.items() if delta}
+            if deltas:
+                self._write(deltas)
+
+    def close(self):
+        self.flush()
+
+    def _write(self, deltas: dict):
+        try:
+            if not self.dashboard_path.exists():
+                logger.error(f"Dashboard not found at {self.dashboard_path}")
+                return
+            content = self.dashboard_path.read_text(encoding='utf-8')
+            new_content = render_metrics(content, deltas)
+            if new_content == content:
+                return
+            # Dot-prefixed so the vault watchers ignore it
+            tmp_path = self.dashboard_path.with_name(f".{self.dashboard_path.name}.tmp")
+            with open(tmp_path, "w", encoding='utf-8') as f:
+                f.write(new_content)
+            os.replace(tmp_path, self.dashboard_path)
+            self.writes += 1
+        except Exception as e:
+            logger.error(f"Error updating dashboard: {e}")
@@ -0,0 +1,215 @@
+"""
+Write-completion detection shared by the watchers.
+Instead of sleeping a fixed time after on_created, feed every watchdog
+event to a WriteCompletionDetector and act in its on_ready callback,
+which fires once per file when the write is complete:
+
+- closed (inotify IN_CLOSE_WRITE) or moved into the folder: immediately
+- otherwise: once size and mtime have been stable for a short settle time
+
+A handler that finds the file still locked calls retry(path) to have it
+reported again a little later.
+"""
+
+import os
+import sys
+import time
+import heapq
+import logging
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+logger = logging.getLogger("WriteCompletion")
+
+
+def _signature(path: Path):
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return (stat.st_size, stat.st_mtime_ns)
+
+
+class WriteCompletionDetector:
+    """Calls on_ready(path) exactly once per completed write.
+
+    close_events says whether the observer reports file closes (watchdog's
+    inotify backend on Linux does). When it does, a file that is being
+    written is only reported on close, with close_timeout as a safety net;
+    files that appear without a write (renamed or linked in) still go
+    through the stability check. Empty files are held back until they have
+    content or close_timeout passes, since many writers create first and
+    fill later.
+
+    With new_only, only files that appear in the folder (created or moved
+    in) are reported; later edits to an existing file are ignored.
+
+    on_ready runs on the detector's own thread, never on watchdog's.
+    """
+
+    FIRED_MEMORY = 10000
+    # retry(): seconds between reports of a locked file, and how many times
+    RETRY_DELAY = 2.0
+    MAX_RETRIES = 5
+
+    def __init__(self, on_ready, settle: float = 0.2, close_timeout: float = 10.0, close_events: bool = None,
+                 new_only: bool = False):
+        self.on_ready = on_ready
+        self.new_only = new_only
+        self.settle = settle
+        self.close_timeout = close_timeout
+        self.close_events = sys.platform.startswith("linux") if close_events is None else close_events
+
+        self._pending = {}
+        self._timers = []
+        self._ready = []
+        self._fired = OrderedDict()
+        self._retries = {}
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="WriteCompletion", daemon=True)
+        self._thread.start()
+
+    def feed(self, event):
+        """Pass every watchdog event for the watched folder here."""
+        if event.is_directory:
+            return
+        kind = event.event_type
+        if self.new_only and kind in ("modified", "closed") and not self._is_pending(Path(event.src_path)):
+            return
+        if kind == "created":
+            self.watch(Path(event.src_path), writing=False)
+        elif kind == "modified":
+            self.watch(Path(event.src_path), writing=True)
+        elif kind == "closed":
+            self._complete(Path(event.src_path))
+        elif kind == "moved":
+            self._forget(Path(event.src_path))
+            self._complete(Path(event.dest_path))
+        elif kind == "deleted":
+            self._forget(Path(event.src_path))
+
+    def watch(self, path: Path, writing: bool = False):
+        """Start (or restart) waiting for path to become ready."""
+        now = time.monotonic()
+        with self._cond:
+            state = self._pending.get(path)
+            if state is None:
+                state = self._pending[path] = {"since": now, "writing": False, "signature": None}
+            state["writing"] = state["writing"] or writing
+            state["signature"] = _signature(path)
+            self._schedule(path, state, now)
+            self._cond.notify()
+
+    def retry(self, path: Path, delay: float = None):
+        """Reports path again after delay even if it has not changed.
+
+        For handlers that found the file locked: a locked file's size and
+        mtime stay the same, so watch() would never report it again.
+        Returns the attempt number, or 0 (and stops retrying) once
+        MAX_RETRIES attempts were used.
+        """
+        now = time.monotonic()
+        with self._cond:
+            self._fired.pop(path, None)
+            attempts = self._retries.get(path, 0) + 1
+            if attempts > self.MAX_RETRIES:
+                self._retries.pop(path, None)
+                return 0
+            self._retries[path] = attempts
+            state = self._pending[path] = {"since": now, "writing": False, "signature": _signature(path)}
+            state["deadline"] = now + (self.RETRY_DELAY if delay is None else delay)
+            heapq.heappush(self._timers, (state["deadline"], str(path)))
+            self._cond.notify()
+        return attempts
+
+    def _is_pending(self, path: Path):
+        with self._cond:
+            return path in self._pending
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        self._thread.join()
+
+    def _schedule(self, path, state, now):
+        delay = self.close_timeout if (self.close_events and state["writing"]) else self.settle
+        state["deadline"] = now + delay
+        heapq.heappush(self._timers, (state["deadline"], str(path)))
+
+    def _complete(self, path: Path):
+        signature = _signature(path)
+        if signature is None:
+            return
+        if signature[0] == 0:
+            # Closed while still empty: wait for content (or close_timeout)
+            self.watch(path)
+            return
+        with self._cond:
+            self._pending.pop(path, None)
+            self._ready.append(path)
+            self._cond.notify()
+
+    def _forget(self, path: Path):
+        with self._cond:
+            self._pending.pop(path, None)
+            self._fired.pop(path, None)
+            self._retries.pop(path, None)
+
+    def _check_due(self, now):
+        """Moves pending paths whose deadline passed and whose stat is stable to _ready."""
+        while self._timers and self._timers[0][0] <= now:
+            deadline, key = heapq.heappop(self._timers)
+            path = Path(key)
+            state = self._pending.get(path)
+            if state is None or state["deadline"] != deadline:
+                continue  # Stale timer entry
+
+            signature = _signature(path)
+            if signature is None:
+                del self._pending[path]
+            elif signature != state["signature"]:
+                # Still changing: keep waiting
+                state["signature"] = signature
+                self._schedule(path, state, now)
+            elif signature[0] == 0 and now - state["since"] < self.close_timeout:
+                state["deadline"] = now + self.settle
+                heapq.heappush(self._timers, (state["deadline"], key))
+            else:
+                del self._pending[path]
+                self._ready.append(path)
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped and not self._ready:
+                    now = time.monotonic()
+                    self._check_due(now)
+                    if self._ready:
+                        break
+                    timeout = self._timers[0][0] - now if self._timers else None
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                ready, self._ready = self._ready, []
+
+            for path in ready:
+                self._fire(path)
+
+    def _fire(self, path: Path):
+        signature = _signature(path)
+        if signature is None:
+            return
+        with self._cond:
+            if self._fired.get(path) == signature:
+                return  # Already handled this exact content
+            self._fired[path] = signature
+            self._fired.move_to_end(path)
+            while len(self._fired) > self.FIRED_MEMORY:
+                self._fired.popitem(last=False)
+        try:
+            self.on_ready(path)
+        except Exception as e:
+            logger.error(f"Ready handler failed for {path.name}: {e}")
@@ -11,6 +11,11 @@ from datetime import datetime
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from vault_document import format_frontmatter
+from file_readiness import WriteCompletionDetector
+from keyword_classifier import KeywordClassifier, load_taxonomy
+from text_reader import TextFile
+
 
 class IntelligentInboxWatcher(FileSystemEventHandler):
     """Watches Inbox folder and analyzes file content"""
@@ -26,160 +31,89 @@ class IntelligentInboxWatcher(FileSystemEventHandler):
         self.needs_action.mkdir(exist_ok=True)
         self.logs.mkdir(exist_ok=True)
         
+        # Task types and priority keywords, editable in the Company Handbook
+        self.classifier = KeywordClassifier(*load_taxonomy(self.vault_path / 'Company_Handbook.md'))
+        
+        # Reports each new file once it has been fully written
+        self.readiness = WriteCompletionDetector(self.process_file, new_only=True)
+        
         print(f"📁 Watching: {self.inbox}")
         print(f"📋 Target: {self.needs_action}")
         print(f"🧠 Mode: INTELLIGENT (with content analysis)")
     
-    def on_created(self, event):
-        """Called when a new file is created in Inbox"""
+    def on_any_event(self, event):
+        """Feeds Inbox events to the readiness detector; it calls process_file when a write completes"""
         if event.is_directory:
             return
         
-        source = Path(event.src_path)
+        source = Path(event.dest_path if event.event_type == 'moved' else event.src_path)
         
         # Ignore temporary Obsidian files
         if source.name.startswith('.') or source.suffix in ['.tmp', '.swp']:
             return
+        
+        self.readiness.feed(event)
+    
+    def process_file(self, source: Path):
+        """Called once per new file, after it has been fully written"""
+        if source.parent != self.inbox or not source.exists():
+            return
             
         print(f"\n{'='*60}")
         print(f"🆕 NEW FILE DETECTED: {source.name}")
         print(f"{'='*60}")
         
-        # Wait for file to be fully written
-        time.sleep(2)
-        
-        # Try multiple times if file is locked
-        max_retries = 5
-        for attempt in range(max_retries):
-            dest = self.needs_action / source.name
-            try:
-                if not source.exists():
-                    print(f"⚠️  File no longer exists: {source.name}")
-                    return
-                
-                # STEP 1: Read file content
-                print(f"\n📖 Reading file content...")
-                file_content = self.read_file_content(source)
-                
-                # STEP 2: Analyze content
-                print(f"🧠 Analyzing content...")
-                analysis = self.analyze_content(file_content, source.name)
-                
-                # STEP 3: Move file
-                print(f"📦 Moving file to Needs_Action...")
-                shutil.move(str(source), str(dest))
-                print(f"✅ Moved to: {dest}")
-                
-                # STEP 4: Create intelligent metadata
-                print(f"📝 Creating intelligent task report...")
-                self.create_intelligent_metadata(source.name, file_content, analysis)
-                
-                # STEP 5: Log the action
-                self.log_action(source.name, analysis)
-                
-                print(f"\n{'='*60}")
-                print(f"✅ PROCESSING COMPLETE!")
-                print(f"{'='*60}\n")
-                
-                # Success - break the retry loop
-                break
-                
-            except PermissionError:
-                if attempt < max_retries - 1:
-                    print(f"⏳ File locked, retrying... ({attempt + 1}/{max_retries})")
-                    time.sleep(2)
-                else:
-                    print(f"❌ File still locked after {max_retries} attempts")
-            except Exception as e:
-                print(f"❌ Error: {e}")
-                break
-    
-    def read_file_content(self, filepath: Path) -> str:
-        """Read and return file content"""
+        dest = self.needs_action / source.name
         try:
-            # Try different encodings
-            for encoding in ['utf-8', 'latin-1', 'cp1252']:
-                try:
-                    content = filepath.read_text(encoding=encoding)
-                    print(f"   ✓ File size: {len(content)} characters")
-                    return content
-                except UnicodeDecodeError:
-                    continue
-            return "[Binary or unreadable content]"
+            # STEP 1: Read file content
+            print(f"\n📖 Reading file content...")
+            file_content = self.read_file_content(source)
+            
+            # STEP 2: Analyze content
+            print(f"🧠 Analyzing content...")
+            analysis = self.analyze_content(file_content, source.name)
+            
+            # STEP 3: Move file
+            print(f"📦 Moving file to Needs_Action...")
+            shutil.move(str(source), str(dest))
+            print(f"✅ Moved to: {dest}")
+            
+            # STEP 4: Create intelligent metadata
+            print(f"📝 Creating intelligent task report...")
+            self.create_intelligent_metadata(source.name, file_content, analysis)
+            
+            # STEP 5: Log the action
+            self.log_action(source.name, analysis)
+            
+            print(f"\n{'='*60}")
+            print(f"✅ PROCESSING COMPLETE!")
+            print(f"{'='*60}\n")
+            
+        except PermissionError:
+            # Still held open by another program: try again shortly
+            attempt = self.readiness.retry(source)
+            if attempt:
+                print(f"⏳ File locked, retrying... ({attempt}/{self.readiness.MAX_RETRIES})")
+            else:
+                print(f"❌ File still locked after {self.readiness.MAX_RETRIES} attempts")
         except Exception as e:
-            print(f"   ✗ Error reading file: {e}")
-            return "[Error reading file]"
+            print(f"❌ Error: {e}")
     
-    def analyze_content(self, content: str, filename: str) -> dict:
-        """Analyze file content and determine task type"""
-        analysis = {
-            'task_type': 'unknown',
-            'priority': 'normal',
-            'keywords': [],
-            'estimated_time': 'unknown',
-            'suggested_actions': []
-        }
-        
-        content_lower = content.lower()
-        
-        # Detect task type
-        if any(word in content_lower for word in ['invoice', 'payment', 'bill', 'receipt']):
-            analysis['task_type'] = '💰 Financial Task'
-            analysis['suggested_actions'] = [
-                'Review payment details',
-                'Verify amount and recipient',
-                'Process payment or forward to accounting'
-            ]
-        elif any(word in content_lower for word in ['meeting', 'schedule', 'appointment', 'calendar']):
-            analysis['task_type'] = '📅 Scheduling Task'
-            analysis['suggested_actions'] = [
-                'Check calendar availability',
-                'Send meeting invite',
-                'Prepare agenda'
-            ]
-        elif any(word in content_lower for word in ['email', 'reply', 'message', 'contact']):
-            analysis['task_type'] = '✉️ Communication Task'
-            analysis['suggested_actions'] = [
-                'Draft response',
-                'Review and send',
-                'Follow up if needed'
-            ]
-        elif any(word in content_lower for word in ['report', 'analysis', 'summary', 'review']):
-            analysis['task_type'] = '📊 Report/Analysis Task'
-            analysis['suggested_actions'] = [
-                'Gather required data',
-                'Create analysis or summary',
-                'Review and finalize'
-            ]
-        elif any(word in content_lower for word in ['buy', 'purchase', 'shopping', 'groceries']):
-            analysis['task_type'] = '🛒 Shopping/Purchase Task'
-            analysis['suggested_actions'] = [
-                'Create shopping list',
-                'Compare prices',
-                'Make purchase'
-            ]
+    def read_file_content(self, filepath: Path) -> TextFile:
+        """Open file content for streaming; the encoding is detected from a sample"""
+        text = TextFile(filepath)
+        if text.binary:
+            print(f"   ✓ Binary file: {text.size} bytes, content not analyzed")
         else:
-            analysis['task_type'] = '📋 General Task'
-            analysis['suggested_actions'] = [
-                'Review task details',
-                'Determine next steps',
-                'Execute or delegate'
-            ]
-        
-        # Detect priority
-        if any(word in content_lower for word in ['urgent', 'asap', 'emergency', 'immediately']):
-            analysis['priority'] = '🔴 HIGH'
-            analysis['estimated_time'] = 'Today'
-        elif any(word in content_lower for word in ['important', 'priority', 'soon']):
-            analysis['priority'] = '🟡 MEDIUM'
-            analysis['estimated_time'] = 'This week'
-        else:
-            analysis['priority'] = '🟢 NORMAL'
-            analysis['estimated_time'] = 'When possible'
-        
-        # Extract keywords (first 5 meaningful words)
-        words = [w for w in content.split() if len(w) > 3]
-        analysis['keywords'] = words[:5]
+            print(f"   ✓ File size: {text.size} bytes ({text.encoding})")
+            if text.truncated:
+                print(f"   ⚠️  Large file: analyzing the first part and samples only")
+        return text
+    
+    def analyze_content(self, content: TextFile, filename: str) -> dict:
+        """Analyze file content and determine task type"""
+        # One streaming pass over the content for type and priority (see keyword_classifier.py)
+        analysis = self.classifier.classify(content.chunks(), sample=content.preview)
         
         print(f"   ✓ Task Type: {analysis['task_type']}")
         print(f"   ✓ Priority: {analysis['priority']}")
@@ -187,31 +121,34 @@ class IntelligentInboxWatcher(FileSystemEventHandler):
         
         return analysis
     
-    def create_intelligent_metadata(self, filename: str, content: str, analysis: dict):
+    def create_intelligent_metadata(self, filename: str, content: TextFile, analysis: dict):
         """Create an intelligent metadata file with analysis"""
         meta_file = self.needs_action / f"TASK_{filename}.md"
         
         # Preview content (first 200 chars)
-        content_preview = content[:200].replace('\n', ' ')
-        if len(content) > 200:
-            content_preview += "..."
-        
-        metadata_content = f"""---
-type: intelligent_task
-filename: {filename}
-created: {datetime.now().isoformat()}
-task_type: {analysis['task_type']}
-priority: {analysis['priority']}
-estimated_time: {analysis['estimated_time']}
-status: pending_review
----
-
+        if content.binary:
+            content_preview = "[Binary or unreadable content]"
+        else:
+            content_preview = content.preview[:200].replace('\n', ' ')
+            if len(content.preview) > 200:
+                content_preview += "..."
+        
+        header = format_frontmatter({
+            'type': 'intelligent_task',
+            'filename': filename,
+            'created': datetime.now().isoformat(),
+            'task_type': analysis['task_type'],
+            'priority': analysis['priority'],
+            'estimated_time': analysis['estimated_time'],
+            'status': 'pending_review',
+        })
+        metadata_content = header + f"""
 # 🤖 AI Task Analysis Report
 
 ## 📄 File Information
 - **Filename**: {filename}
 - **Detected**: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-- **Content Length**: {len(content)} characters
+- **Content Length**: {content.size} bytes ({content.encoding or 'binary'})
 
 ## 🎯 Task Classification
 - **Type**: {analysis['task_type']}
@@ -297,6 +234,7 @@ def main():
         observer.stop()
     
     observer.join()
+    event_handler.readiness.stop()
     print("✅ Watcher stopped successfully")
 
 
@@ -1,10 +1,13 @@
 import time
-import shutil
 from pathlib import Path
 import logging
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
 
+from vault_document import format_frontmatter, write_document
+from blob_store import BlobStore
+from file_readiness import WriteCompletionDetector
+
 # Ensure base_watcher is importable if needed, 
 # although watchdog uses an event-driven approach rather than the poll-loop of base_watcher.
 # I will adapt the structure slightly to fit the watchdog requirement.
@@ -20,32 +23,39 @@ class InboxHandler(FileSystemEventHandler):
         self.inbox.mkdir(parents=True, exist_ok=True)
         self.needs_action.mkdir(parents=True, exist_ok=True)
 
-    def on_created(self, event):
-        if event.is_directory:
-            return
-        
-        source = Path(event.src_path)
-        if source.parent != self.inbox:
+        self.blobs = BlobStore(self.vault_path)
+
+        # Calls process_file once per new file, when its write has completed
+        self.readiness = WriteCompletionDetector(self.process_file, new_only=True)
+
+    def on_any_event(self, event):
+        self.readiness.feed(event)
+
+    def process_file(self, source: Path):
+        if source.parent != self.inbox or not source.exists():
             return
 
         self.logger.info(f"New file detected: {source.name}")
         
-        # Wait a moment for file to be fully written
-        time.sleep(1)
-        
+        size = source.stat().st_size
         dest_file = self.needs_action / f"FILE_{source.name}"
-        shutil.copy2(source, dest_file)
+        try:
+            # Stored once by content and linked into Needs_Action; the Inbox original is consumed
+            self.blobs.ingest(source, dest_file)
+        except FileNotFoundError:
+            self.logger.info(f"{source.name} was already taken from the Inbox")
+            return
         
-        # Create metadata file
+        # Create metadata file (separate from the payload, which may be a hard link)
         meta_path = self.needs_action / f"FILE_{source.name}.md"
-        meta_path.write_text(f"""---
-type: file_drop
-original_name: {source.name}
-size: {source.stat().st_size}
-timestamp: {time.strftime('%Y-%m-%dT%H:%M:%S')}
-status: pending
----
-
+        header = format_frontmatter({
+            'type': 'file_drop',
+            'original_name': source.name,
+            'size': size,
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'status': 'pending',
+        })
+        write_document(meta_path, header + f"""
 # New File Dropped
 The file `{source.name}` was detected in the Inbox and is ready for processing.
 
@@ -71,3 +81,4 @@ if __name__ == "__main__":
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    handler.readiness.stop()
@@ -0,0 +1,349 @@
+"""
+In-memory stand-in for the Gmail API client (googleapiclient's service
+object), for exercising GmailService and GmailWatcher offline. Every
+execute() counts as one HTTP round trip and sleeps for `latency`; an HTTP
+batch is one round trip however many requests it carries, plus
+`item_latency` of server time per request inside it. The mailbox
+keeps a history log for history.list, pages list results, and answers 404
+for history older than `history_limit` records.
+
+Compare the per-message, batched and parallel ingestion paths:
+    python gmail_fake.py --messages 200 --latency 0.05 --workers 4
+Compare re-listing unread mail with historyId sync over several polls:
+    python gmail_fake.py --polls 10 --messages 20
+"""
+
+import json
+import time
+import base64
+import logging
+import argparse
+import tempfile
+import threading
+
+
+def make_message(i: int, body: str = None):
+    body = body or f"Hello, this is test message {i}."
+    return {
+        "id": f"{i:016x}",
+        "threadId": f"{i:016x}",
+        "labelIds": ["INBOX", "UNREAD"],
+        "snippet": body[:100],
+        "payload": {
+            "mimeType": "text/plain",
+            "headers": [
+                {"name": "From", "value": f"Sender {i} <sender{i}@example.com>"},
+                {"name": "Subject", "value": f"Test message {i}"},
+            ],
+            "body": {"size": len(body), "data": base64.urlsafe_b64encode(body.encode()).decode()},
+        },
+    }
+
+
+def _b64(data: bytes):
+    return base64.urlsafe_b64encode(data).decode()
+
+
+def make_multipart_message(i: int, plain: str = None, html: str = None, charset: str = "utf-8", attachment: bytes = None):
+    """multipart/mixed holding a multipart/alternative body and an optional attachment,
+    as Gmail returns it (attachment data left to attachments.get)."""
+    alternative = []
+    if plain is not None:
+        alternative.append({"partId": "0.0", "mimeType": "text/plain", "filename": "",
+                            "headers": [{"name": "Content-Type", "value": f'text/plain; charset="{charset}"'}],
+                            "body": {"size": len(plain), "data": _b64(plain.encode(charset))}})
+    if html is not None:
+        alternative.append({"partId": "0.1", "mimeType": "text/html", "filename": "",
+                            "headers": [{"name": "Content-Type", "value": f'text/html; charset="{charset}"'}],
+                            "body": {"size": len(html), "data": _b64(html.encode(charset))}})
+    parts = [{"partId": "0", "mimeType": "multipart/alternative", "filename": "", "headers": [],
+              "body": {"size": 0}, "parts": alternative}]
+    if attachment is not None:
+        parts.append({"partId": "1", "mimeType": "application/octet-stream", "filename": f"report-{i}.bin",
+                      "headers": [{"name": "Content-Disposition", "value": f'attachment; filename="report-{i}.bin"'}],
+                      "body": {"size": len(attachment), "attachmentId": f"att-{i}"}})
+    message = make_message(i)
+    message["payload"] = {"mimeType": "multipart/mixed", "filename": "", "headers": message["payload"]["headers"],
+                          "body": {"size": 0}, "parts": parts}
+    return message
+
+
+class FakeHttpError(Exception):
+    """Carries resp.status like googleapiclient.errors.HttpError."""
+
+    class _Resp:
+        def __init__(self, status):
+            self.status = status
+
+    def __init__(self, status, reason):
+        super().__init__(f"<HttpError {status}: {reason}>")
+        self.resp = self._Resp(status)
+
+
+class FakeRequest:
+    def __init__(self, api, method, kwargs):
+        self.api = api
+        self.method = method
+        self.kwargs = kwargs
+
+    def execute(self):
+        self.api.round_trip()
+        return self.api.respond(self.method, self.kwargs)
+
+
+class FakeBatch:
+    def __init__(self, api, callback):
+        self.api = api
+        self.callback = callback
+        self.requests = []
+
+    def add(self, request, request_id=None, callback=None):
+        if len(self.requests) >= self.api.BATCH_LIMIT:
+            raise ValueError("Exceeded maximum number of requests in a batch")
+        self.requests.append((request, request_id or str(len(self.requests)), callback or self.callback))
+
+    def execute(self):
+        self.api.round_trip(len(self.requests))
+        with self.api._lock:
+            self.api.batches += 1
+        for request, request_id, callback in self.requests:
+            try:
+                response, error = self.api.respond(request.method, request.kwargs), None
+            except Exception as e:
+                response, error = None, e
+            if callback:
+                callback(request_id, response, error)
+
+
+class _Resource:
+    def __init__(self, api, prefix):
+        self.api = api
+        self.prefix = prefix
+
+    def __getattr__(self, name):
+        if name == "attachments":
+            return lambda: _Resource(self.api, f"{self.prefix}.attachments")
+
+        def method(**kwargs):
+            return FakeRequest(self.api, f"{self.prefix}.{name}", kwargs)
+        return method
+
+
+class _Users:
+    def __init__(self, api):
+        self.api = api
+
+    def messages(self):
+        return _Resource(self.api, "messages")
+
+    def history(self):
+        return _Resource(self.api, "history")
+
+    def getProfile(self, **kwargs):
+        return FakeRequest(self.api, "users.getProfile", kwargs)
+
+
+class FakeGmailAPI:
+    """Mailbox of generated messages behind the googleapiclient call shape."""
+
+    BATCH_LIMIT = 100
+
+    def __init__(self, messages=(), latency: float = 0.0, page_size: int = 100, history_limit: int = 10000,
+                 item_latency: float = 0.0):
+        self.mailbox = {}
+        self.latency = latency
+        self.item_latency = item_latency
+        self.page_size = page_size
+        self.history_limit = history_limit
+        self.history = []  # (history id, message id, labels when added)
+        self.attachments = {}  # attachment id -> bytes
+        self.history_id = 1000
+        self.requests = 0
+        self.batches = 0
+        self.bytes = 0  # Size of the JSON responses, a proxy for bandwidth
+        self._lock = threading.Lock()
+        for message in messages:
+            self.deliver(message)
+
+    def deliver(self, message):
+        """Adds a message to the mailbox as new mail."""
+        self.history_id += 1
+        self.mailbox[message["id"]] = message
+        self.history.append((self.history_id, message["id"], list(message["labelIds"])))
+        del self.history[:-self.history_limit]
+
+    def round_trip(self, items: int = 1):
+        with self._lock:
+            self.requests += 1
+        delay = self.latency + self.item_latency * items
+        if delay:
+            time.sleep(delay)
+
+    # Service shape: service.users().messages().get(...).execute()
+    def users(self):
+        return _Users(self)
+
+    def new_batch_http_request(self, callback=None):
+        return FakeBatch(self, callback)
+
+    def respond(self, method, kwargs):
+        response = self.handle(method, kwargs)
+        size = len(json.dumps(response))
+        with self._lock:
+            self.bytes += size
+        return response
+
+    def _page(self, items, kwargs):
+        start = int(kwargs.get("pageToken") or 0)
+        size = min(kwargs.get("maxResults") or self.page_size, self.page_size)
+        next_token = str(start + size) if start + size < len(items) else None
+        return items[start:start + size], next_token
+
+    def handle(self, method, kwargs):
+        if method == "users.getProfile":
+            return {"emailAddress": "me@example.com", "historyId": str(self.history_id)}
+        if method == "messages.list":
+            # Newest first, like Gmail; only 'is:unread' of the query is honoured
+            unread = [m for m in reversed(list(self.mailbox.values())) if "UNREAD" in m["labelIds"]]
+            page, next_token = self._page(unread, kwargs)
+            response = {"messages": [{"id": m["id"], "threadId": m["threadId"]} for m in page],
+                        "resultSizeEstimate": len(unread)}
+            if next_token:
+                response["nextPageToken"] = next_token
+            return response
+        if method == "history.list":
+            start = int(kwargs["startHistoryId"])
+            if self.history and start < self.history[0][0] - 1:
+                raise FakeHttpError(404, "Requested entity was not found.")
+            records = [record for record in self.history if record[0] > start]
+            page, next_token = self._page(records, kwargs)
+            response = {"history": [{"id": str(hid), "messagesAdded": [{"message": {
+                            "id": msg_id, "threadId": msg_id, "labelIds": labels}}]}
+                        for hid, msg_id, labels in page],
+                        "historyId": str(self.history_id)}
+            if next_token:
+                response["nextPageToken"] = next_token
+            return response
+        if method == "messages.get":
+            message = self.mailbox.get(kwargs["id"])
+            if message is None:
+                raise FakeHttpError(404, f"message {kwargs['id']} not found")
+            if kwargs.get("format") == "metadata":
+                wanted = kwargs.get("metadataHeaders") or []
+                headers = [h for h in message["payload"]["headers"] if not wanted or h["name"] in wanted]
+                return {**message, "payload": {"mimeType": message["payload"]["mimeType"], "headers": headers}}
+            return message
+        if method == "messages.attachments.get":
+            data = self.attachments.get(kwargs["id"])
+            if data is None:
+                raise FakeHttpError(404, f"attachment {kwargs['id']} not found")
+            return {"attachmentId": kwargs["id"], "size": len(data), "data": _b64(data)}
+        if method == "messages.batchModify":
+            body = kwargs["body"]
+            if len(body["ids"]) > 1000:
+                raise ValueError("400 too many ids")
+            for msg_id in body["ids"]:
+                labels = self.mailbox[msg_id]["labelIds"]
+                labels[:] = [l for l in labels if l not in body.get("removeLabelIds", [])] + body.get("addLabelIds", [])
+            return {}
+        if method == "messages.send":
+            return {"id": f"sent-{self.requests}"}
+        raise NotImplementedError(method)
+
+
+def compare_ingestion(args):
+    from gmail_service import GmailService
+    from gmail_watcher import GmailWatcher
+
+    body = "Quarterly figures attached below. " * 200
+
+    def run(batched: bool, workers: int = 1):
+        api = FakeGmailAPI([make_message(i, body) for i in range(args.messages)], latency=args.latency,
+                           item_latency=args.item_latency)
+        gmail = GmailService(None, None, service=api, concurrency=workers)
+        with tempfile.TemporaryDirectory() as tmp:
+            start = time.perf_counter()
+            if batched:
+                # Metadata in batches; the watcher's local store holds what it has seen
+                watcher = GmailWatcher(tmp, gmail=gmail)
+                watcher.ingest(watcher.check_for_updates())
+            else:
+                # The previous loop: one full get and one batchModify per message
+                for msg_id in gmail.list_unread_messages():
+                    if gmail.get_message_content(msg_id):
+                        gmail.mark_as_read(msg_id)
+            gmail.close()
+            return api.requests, api.bytes, time.perf_counter() - start
+
+    for label, batched, workers in (("per-message", False, 1), ("batched", True, 1),
+                                    (f"{args.workers} workers", True, args.workers)):
+        requests, size, elapsed = run(batched, workers)
+        print(f"{label:<12} {args.messages} messages: {requests:3d} HTTP requests, {size / 1024:7.1f} KB, "
+              f"{elapsed * 1000:7.1f} ms")
+
+
+def compare_polling(args):
+    """Requests per poll while `messages` new mails arrive before each of `polls` polls."""
+    from gmail_service import GmailService
+    from gmail_watcher import GmailWatcher
+
+    def run(incremental: bool):
+        # Other clients leave some mail unread: it piles up in the unread query
+        api = FakeGmailAPI([make_message(i) for i in range(args.backlog)], latency=args.latency)
+        for message in api.mailbox.values():
+            message["labelIds"] = ["INBOX", "UNREAD"]
+        gmail = GmailService(None, None, service=api)
+        seen = set()
+        per_poll = []
+        with tempfile.TemporaryDirectory() as tmp:
+            watcher = GmailWatcher(tmp, gmail=gmail)
+            watcher.ingest(watcher.check_for_updates())  # Initial sync, not counted
+            seen.update(api.mailbox)
+            next_id = args.backlog
+            for poll in range(args.polls):
+                # Every other poll finds no new mail
+                arriving = args.messages if poll % 2 == 0 else 0
+                for i in range(next_id, next_id + arriving):
+                    api.deliver(make_message(i))
+                next_id += arriving
+                before = api.requests
+                if incremental:
+                    messages = watcher.check_for_updates()
+                    watcher.ingest(messages)
+                    ingested = [m["id"] for m in messages]
+                else:
+                    # The previous poll: the first page of the unread query, with nothing marked read
+                    ids = api.handle("messages.list", {})["messages"]
+                    api.round_trip()
+                    ingested = [m["id"] for m in ids if m["id"] not in seen]
+                seen.update(ingested)
+                per_poll.append((arriving, len(ingested), api.requests - before))
+        return per_poll, next_id - len(seen)
+
+    for label, incremental in (("re-list", False), ("history", True)):
+        per_poll, missed = run(incremental)
+        idle = [requests for arriving, _, requests in per_poll if not arriving]
+        busy = [requests for arriving, _, requests in per_poll if arriving]
+        print(f"{label:<8} idle poll: {max(idle)} request(s), poll with {args.messages} new: {max(busy)} request(s), "
+              f"missed messages: {missed}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=20, help="Unread messages per cycle")
+    parser.add_argument("--latency", type=float, default=0.05, help="Simulated round-trip time (s)")
+    parser.add_argument("--item-latency", type=float, default=0.002, help="Server time per request in a batch (s)")
+    parser.add_argument("--workers", type=int, default=4, help="Fetch pool size for the parallel run")
+    parser.add_argument("--polls", type=int, default=0, help="Compare polling strategies over this many polls")
+    parser.add_argument("--backlog", type=int, default=150, help="Old unread mail left by other clients")
+    args = parser.parse_args()
+
+    if args.polls:
+        compare_polling(args)
+    else:
+        compare_ingestion(args)
+
+
+if __name__ == "__main__":
+    logging.disable(logging.INFO)
+    main()
@@ -1,13 +1,94 @@
 import os
+import re
+import html
+import json
+import time
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
-from google.auth.transport.requests import Request
+from google.auth.transport.requests import AuthorizedSession, Request
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 import logging
 
+from mime_walker import extract_body, list_attachments, b64_chunks, b64_decode_stream
+from outbox import TokenBucket
+
+API_ROOT = 'https://gmail.googleapis.com/gmail/v1/users/me'
+# Bytes read from the network per step when streaming an attachment
+DOWNLOAD_CHUNK = 256 * 1024
+
+
+def stream_json_string(chunks, key):
+    """The value of a top-level string field of a JSON object arriving in byte
+    chunks, yielded piece by piece. Meant for base64 data, which has no escapes."""
+    chunks = iter(chunks)
+    marker = f'"{key}"'.encode()
+    buffer = b""
+    while True:
+        index = buffer.find(marker)
+        if index >= 0:
+            buffer = buffer[index + len(marker):]
+            break
+        # Keep enough of the tail to match a marker split across chunks
+        buffer = buffer[-len(marker):]
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError(f"No '{key}' field in response")
+        buffer += chunk
+    # Skip ': ' up to the opening quote
+    while True:
+        index = buffer.find(b'"')
+        if index >= 0:
+            buffer = buffer[index + 1:]
+            break
+        chunk = next(chunks, None)
+        if chunk is None:
+            raise ValueError(f"Truncated '{key}' field")
+        buffer = chunk
+    while True:
+        index = buffer.find(b'"')
+        if index >= 0:
+            if index:
+                yield buffer[:index]
+            return
+        if buffer:
+            yield buffer
+        buffer = next(chunks, None)
+        if buffer is None:
+            raise ValueError(f"Truncated '{key}' field")
+
+
+def safe_filename(name):
+    name = re.sub(r'[^\w.\- ]', '_', os.path.basename(name or '')).strip(' .')
+    return name or 'attachment'
+
+
+def attachment_filenames(attachments):
+    """A safe, unique file name for each attachment, in order."""
+    names = []
+    for attachment in attachments:
+        name = safe_filename(attachment['filename'])
+        stem, ext = os.path.splitext(name)
+        counter = 1
+        while name in names:
+            counter += 1
+            name = f"{stem} ({counter}){ext}"
+        names.append(name)
+    return names
+
+
+class HistoryExpired(Exception):
+    """The stored historyId is older than the history Gmail keeps (HTTP 404)."""
+
+    def __init__(self, history_id):
+        super().__init__(f"History {history_id} is no longer available")
+        self.history_id = history_id
+
+
 class GmailService:
     SCOPES = [
         'https://www.googleapis.com/auth/gmail.send', 
@@ -15,18 +96,53 @@ class GmailService:
         'https://www.googleapis.com/auth/gmail.modify'
     ]
 
-    def __init__(self, credentials_path, token_path):
+    # Requests per HTTP batch (Gmail recommends at most 50) and ids per batchModify
+    BATCH_SIZE = 50
+    MODIFY_LIMIT = 1000
+
+    # Page size for messages.list and history.list (the API maximum is 500)
+    PAGE_SIZE = 500
+    # Full resyncs pick up recent unread inbox mail; newer_than spans midnight
+    RESYNC_QUERY = 'is:unread in:inbox newer_than:1d'
+    RESYNC_LIMIT = 2000
+    # A pending message that fails to fetch this many times is dropped
+    MAX_FETCH_ATTEMPTS = 5
+    # Headers requested with format='metadata'
+    METADATA_HEADERS = ['From', 'Subject', 'Date']
+
+    # Gmail's per-user limit is 250 quota units per second as a moving average,
+    # so short bursts are allowed; messages.get costs 5
+    QUOTA_UNITS_PER_SECOND = int(os.environ.get("GMAIL_QUOTA_UNITS", 250))
+    QUOTA_BURST = 4 * QUOTA_UNITS_PER_SECOND
+    GET_COST = 5
+    # Rate-limited (429) fetches are retried this many times, with backoff
+    RATE_LIMIT_RETRIES = 3
+
+    def __init__(self, credentials_path, token_path, service=None, state_path=None, concurrency=None):
         self.credentials_path = credentials_path
         self.token_path = token_path
         self.creds = None
-        self.service = None
+        self.service = service
+        # Sync state for sync(): last historyId plus messages seen but not yet ingested
+        self.state_path = state_path
+        self._state = None
         self.logger = logging.getLogger("GmailService")
+
+        # Fetch pool: batches run in parallel, each worker with its own service object
+        # (googleapiclient is not thread-safe) and so its own kept-alive connection
+        self.concurrency = concurrency or int(os.environ.get("GMAIL_FETCH_WORKERS", 4))
+        self.quota = TokenBucket(self.QUOTA_UNITS_PER_SECOND, capacity=self.QUOTA_BURST)
+        self._local = threading.local()
+        self._pool = None
+        self._pool_lock = threading.Lock()
         
         # Suppress noisy google logs immediately
         logging.getLogger('googleapiclient.discovery_cache').setLevel(logging.ERROR)
         logging.getLogger('googleapiclient.discovery').setLevel(logging.ERROR)
         
-        self._authenticate()
+        # An injected service (e.g. the fake API in gmail_fake.py) skips OAuth
+        if self.service is None:
+            self._authenticate()
 
     def _authenticate(self):
         if os.path.exists(self.token_path):
@@ -51,83 +167,364 @@ class GmailService:
         if self.creds:
             self.service = build('gmail', 'v1', credentials=self.creds)
 
-    def list_unread_messages(self, query='is:unread'):
+    def _worker_service(self):
+        """This thread's service object; an injected service is shared as is."""
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            if self.creds:
+                # Own AuthorizedHttp, so TLS is set up once per worker and then reused
+                service = build('gmail', 'v1', credentials=self.creds, cache_discovery=False)
+            else:
+                service = self.service
+            self._local.service = service
+        return service
+
+    def _fetch_pool(self):
+        with self._pool_lock:
+            if self._pool is None:
+                self._pool = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="GmailFetch")
+            return self._pool
+
+    def close(self):
+        """Shuts down the fetch pool."""
+        with self._pool_lock:
+            if self._pool is not None:
+                self._pool.shutdown(wait=True)
+                self._pool = None
+
+    def list_unread_messages(self, query='is:unread', limit=None):
+        """Ids of the messages matching query, following nextPageToken up to limit."""
         if not self.service:
             return []
         try:
-            results = self.service.users().messages().list(userId='me', q=query).execute()
-            messages = results.get('messages', [])
-            return [m['id'] for m in messages]
+            return self._list_message_ids(query, limit)
         except Exception as e:
             self.logger.error(f"Error listing messages: {e}")
             return []
 
+    def _list_message_ids(self, query, limit=None):
+        # Raises on any API error, so a partial listing is never taken as complete
+        ids = []
+        page_token = None
+        while True:
+            results = self.service.users().messages().list(
+                userId='me', q=query, maxResults=self.PAGE_SIZE, pageToken=page_token).execute()
+            ids.extend(m['id'] for m in results.get('messages', []))
+            page_token = results.get('nextPageToken')
+            if not page_token or (limit and len(ids) >= limit):
+                break
+        return ids[:limit] if limit else ids
+
+    def get_history_id(self):
+        """The mailbox's current historyId."""
+        return self.service.users().getProfile(userId='me').execute()['historyId']
+
+    def list_history(self, start_history_id, label_id='INBOX'):
+        """(message ids added to label_id since start_history_id, latest historyId).
+
+        Follows nextPageToken through every page. Raises HistoryExpired when
+        Gmail no longer has history that far back.
+        """
+        ids = []
+        history_id = start_history_id
+        page_token = None
+        while True:
+            try:
+                results = self.service.users().history().list(
+                    userId='me', startHistoryId=start_history_id, historyTypes=['messageAdded'],
+                    labelId=label_id, maxResults=self.PAGE_SIZE, pageToken=page_token).execute()
+            except Exception as e:
+                if getattr(getattr(e, 'resp', None), 'status', None) == 404:
+                    raise HistoryExpired(start_history_id) from e
+                raise
+            for record in results.get('history', []):
+                for added in record.get('messagesAdded', []):
+                    message = added['message']
+                    labels = message.get('labelIds', [])
+                    # Our own drafts and sent mail can carry INBOX too
+                    if 'DRAFT' not in labels and 'SENT' not in labels:
+                        ids.append(message['id'])
+            history_id = results.get('historyId', history_id)
+            page_token = results.get('nextPageToken')
+            if not page_token:
+                return ids, history_id
+
+    def _load_state(self):
+        if self._state is None:
+            self._state = {}
+            if self.state_path:
+                try:
+                    with open(self.state_path, encoding='utf-8') as f:
+                        self._state = json.load(f)
+                except FileNotFoundError:
+                    pass
+                except ValueError as e:
+                    self.logger.error(f"Gmail sync state unreadable, resyncing: {e}")
+        return self._state
+
+    def _save_state(self, state):
+        # Without a state_path the sync state only lives as long as this object
+        self._state = state
+        if not self.state_path:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.state_path)), exist_ok=True)
+        tmp_path = f"{self.state_path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, self.state_path)
+
+    def sync(self):
+        """Ids of new inbox messages not yet acknowledged, oldest first.
+
+        Normally one history.list call since the stored historyId. A full
+        resync (RESYNC_QUERY) only happens on the first run or when that
+        historyId has expired. New ids are stored as pending before they are
+        returned, so nothing is lost if the caller fails to ingest them. If
+        any request fails, the stored historyId is left as it was and the
+        same delta or resync is tried again on the next call.
+        """
+        if not self.service:
+            return []
+        state = self._load_state()
+        pending = dict(state.get('pending', {}))
+        history_id = state.get('history_id')
+        try:
+            try:
+                if history_id is None:
+                    raise HistoryExpired(None)
+                new_ids, history_id = self.list_history(history_id)
+            except HistoryExpired as e:
+                if e.history_id is not None:
+                    self.logger.warning(f"History {e.history_id} expired, running a full resync")
+                # Take the history id first so mail arriving during the listing shows up in the next delta
+                history_id = self.get_history_id()
+                # messages.list returns newest first
+                new_ids = self._list_message_ids(self.RESYNC_QUERY, limit=self.RESYNC_LIMIT)[::-1]
+        except Exception as e:
+            self.logger.error(f"Error syncing mailbox: {e}")
+            return list(pending)
+
+        for msg_id in new_ids:
+            pending.setdefault(msg_id, 0)
+        if new_ids or history_id != state.get('history_id'):
+            self._save_state({'history_id': history_id, 'pending': pending})
+        return list(pending)
+
+    def acknowledge(self, done_ids, attempted_ids=()):
+        """Drops ingested ids from the pending set; counts a failed attempt for the rest."""
+        state = dict(self._load_state())
+        pending = dict(state.get('pending', {}))
+        for msg_id in done_ids:
+            pending.pop(msg_id, None)
+        done_ids = set(done_ids)
+        for msg_id in attempted_ids:
+            if msg_id in pending and msg_id not in done_ids:
+                pending[msg_id] += 1
+                if pending[msg_id] >= self.MAX_FETCH_ATTEMPTS:
+                    self.logger.error(f"Giving up on message {msg_id} after {pending[msg_id]} attempts")
+                    del pending[msg_id]
+        state['pending'] = pending
+        self._save_state(state)
+
     def get_message_content(self, msg_id):
         if not self.service:
             return None
         try:
             message = self.service.users().messages().get(userId='me', id=msg_id, format='full').execute()
-            
-            payload = message.get('payload', {})
-            headers = payload.get('headers', [])
-            
-            result = {
-                'id': msg_id,
-                'from': '',
-                'subject': '',
-                'body': '',
-                'snippet': message.get('snippet', '')
-            }
-            
-            for header in headers:
-                if header['name'] == 'From':
-                    result['from'] = header['value']
-                if header['name'] == 'Subject':
-                    result['subject'] = header['value']
-            
-            # Extract body
-            if 'parts' in payload:
-                for part in payload['parts']:
-                    if part['mimeType'] == 'text/plain':
-                        data = part['body'].get('data')
-                        if data:
-                            result['body'] = base64.urlsafe_b64decode(data).decode()
-            else:
-                data = payload.get('body', {}).get('data')
-                if data:
-                    result['body'] = base64.urlsafe_b64decode(data).decode()
-            
-            return result
+            return self._parse_message(msg_id, message)
         except Exception as e:
             self.logger.error(f"Error getting message {msg_id}: {e}")
             return None
 
-    def mark_as_read(self, msg_id):
+    def _get_request(self, service, msg_id, format):
+        if format == 'metadata':
+            return service.users().messages().get(
+                userId='me', id=msg_id, format='metadata', metadataHeaders=self.METADATA_HEADERS)
+        return service.users().messages().get(userId='me', id=msg_id, format=format)
+
+    def get_messages(self, msg_ids, format='full'):
+        """Fetches many messages with HTTP batch requests, up to `concurrency` batches at a time.
+
+        Returns ({id: content}, rate_limited): content is in the same form as
+        get_message_content for the messages that could be fetched, and
+        rate_limited lists the ids still throttled (429) after the retries,
+        which are not failures of the messages themselves. With
+        format='metadata' only the headers and snippet are downloaded and
+        body is empty.
+        """
+        if not self.service or not msg_ids:
+            return {}, []
+        # Batch request ids must be unique
+        msg_ids = list(dict.fromkeys(msg_ids))
+        # Spread small fetches over the workers too, BATCH_SIZE at most per round trip
+        size = min(self.BATCH_SIZE, -(-len(msg_ids) // self.concurrency))
+        chunks = [msg_ids[start:start + size] for start in range(0, len(msg_ids), size)]
+        results = {}
+        rate_limited = []
+        if len(chunks) == 1:
+            outcomes = [self._fetch_batch(chunks[0], format)]
+        else:
+            outcomes = self._fetch_pool().map(lambda chunk: self._fetch_batch(chunk, format), chunks)
+        for fetched, limited in outcomes:
+            results.update(fetched)
+            rate_limited.extend(limited)
+        return results, rate_limited
+
+    def _fetch_batch(self, msg_ids, format):
+        """One batch request on this thread's service, retrying rate-limited ids.
+
+        Returns ({id: content}, ids still rate limited).
+        """
+        service = self._worker_service()
+        results = {}
+        for attempt in range(self.RATE_LIMIT_RETRIES + 1):
+            limited = []
+
+            def callback(request_id, response, exception):
+                if exception is not None:
+                    if getattr(getattr(exception, 'resp', None), 'status', None) == 429:
+                        limited.append(request_id)
+                    else:
+                        self.logger.error(f"Error getting message {request_id}: {exception}")
+                    return
+                try:
+                    results[request_id] = self._parse_message(request_id, response)
+                except Exception as e:
+                    self.logger.error(f"Error parsing message {request_id}: {e}")
+
+            # Every request in a batch counts against the per-user quota
+            self.quota.acquire(min(self.quota.capacity, self.GET_COST * len(msg_ids)))
+            batch = service.new_batch_http_request(callback=callback)
+            for msg_id in msg_ids:
+                batch.add(self._get_request(service, msg_id, format), request_id=msg_id)
+            try:
+                batch.execute()
+            except Exception as e:
+                self.logger.error(f"Error fetching message batch: {e}")
+            if not limited:
+                break
+            msg_ids = limited
+            if attempt < self.RATE_LIMIT_RETRIES:
+                time.sleep(2 ** attempt)
+        else:
+            self.logger.warning(f"{len(msg_ids)} messages still rate limited, left for the next poll")
+            return results, msg_ids
+        return results, []
+
+    def _parse_message(self, msg_id, message):
+        payload = message.get('payload', {})
+        headers = payload.get('headers', [])
+        
+        result = {
+            'id': msg_id,
+            'thread_id': message.get('threadId', ''),
+            'labels': message.get('labelIds', []),
+            'from': '',
+            'subject': '',
+            'date': '',
+            'body': '',
+            # Gmail sends the snippet HTML-escaped; keep plain text, the dashboard escapes on display
+            'snippet': html.unescape(message.get('snippet', ''))
+        }
+        
+        for header in headers:
+            if header['name'] == 'From':
+                result['from'] = header['value']
+            if header['name'] == 'Subject':
+                result['subject'] = header['value']
+            if header['name'] == 'Date':
+                result['date'] = header['value']
+        
+        # Walks nested multiparts; metadata responses have no parts and give an empty body
+        result['body'], result['body_truncated'] = extract_body(payload)
+        result['attachments'] = list_attachments(payload)
+        
+        return result
+
+    def _attachment_stream(self, msg_id, attachment_id):
+        """Raw JSON of an attachments.get response, in DOWNLOAD_CHUNK pieces.
+
+        Read straight from the socket; googleapiclient would load the whole
+        response first.
+        """
+        session = AuthorizedSession(self.creds)
+        url = f"{API_ROOT}/messages/{msg_id}/attachments/{attachment_id}"
+        with session.get(url, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            yield from response.iter_content(DOWNLOAD_CHUNK)
+
+    def save_attachment(self, msg_id, attachment, folder, filename=None):
+        """Writes one attachment from list_attachments into folder; returns its path.
+
+        Data is decoded and written in fixed-size chunks, so a large
+        attachment is never held in memory whole.
+        """
+        os.makedirs(folder, exist_ok=True)
+        path = os.path.join(folder, filename or safe_filename(attachment['filename']))
+        tmp_path = f"{path}.part"
+        if attachment.get('data'):
+            # Small attachments come inline in the message
+            pieces = b64_chunks(attachment['data'])
+        elif self.creds:
+            stream = self._attachment_stream(msg_id, attachment['attachment_id'])
+            pieces = b64_decode_stream(stream_json_string(stream, 'data'))
+        else:
+            # Injected service (no credentials for a raw session): decoded in slices all the same
+            response = self.service.users().messages().attachments().get(
+                userId='me', messageId=msg_id, id=attachment['attachment_id']).execute()
+            pieces = b64_chunks(response['data'])
+        try:
+            with open(tmp_path, 'wb') as f:
+                for piece in pieces:
+                    f.write(piece)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def save_attachments(self, msg_id, attachments, folder):
+        """Saves every attachment of a message; returns the paths written."""
+        paths = []
+        for attachment, name in zip(attachments, attachment_filenames(attachments)):
+            try:
+                paths.append(self.save_attachment(msg_id, attachment, folder, filename=name))
+            except Exception as e:
+                self.logger.error(f"Error saving attachment {attachment['filename']} of {msg_id}: {e}")
+        return paths
+
+    def mark_as_read(self, msg_ids):
+        """Removes UNREAD from one id or a list of ids, MODIFY_LIMIT per call."""
         if not self.service:
             return False
+        if isinstance(msg_ids, str):
+            msg_ids = [msg_ids]
         try:
-            self.service.users().messages().batchModify(
-                userId='me',
-                body={'ids': [msg_id], 'removeLabelIds': ['UNREAD']}
-            ).execute()
+            for start in range(0, len(msg_ids), self.MODIFY_LIMIT):
+                self.service.users().messages().batchModify(
+                    userId='me',
+                    body={'ids': msg_ids[start:start + self.MODIFY_LIMIT], 'removeLabelIds': ['UNREAD']}
+                ).execute()
             return True
         except Exception as e:
-            self.logger.error(f"Error marking message {msg_id} as read: {e}")
+            self.logger.error(f"Error marking {len(msg_ids)} messages as read: {e}")
             return False
 
+    def _build_message(self, to, subject, body):
+        message = EmailMessage()
+        message.set_content(body)
+        message['To'] = to
+        message['Subject'] = subject
+        return {'raw': base64.urlsafe_b64encode(message.as_bytes()).decode()}
+
     def send_message(self, to, subject, body):
         if not self.service:
             self.logger.error("Cannot send email: No valid service.")
             return None
 
         try:
-            message = EmailMessage()
-            message.set_content(body)
-            message['To'] = to
-            message['Subject'] = subject
-
-            encoded_message = base64.urlsafe_b64encode(message.as_bytes()).decode()
-            create_message = {'raw': encoded_message}
+            create_message = self._build_message(to, subject, body)
 
             send_message = (self.service.users().messages().send(userId="me", body=create_message).execute())
             self.logger.info(f'Sent message to {to}. Message Id: {send_message["id"]}')
@@ -135,3 +532,24 @@ class GmailService:
         except HttpError as error:
             self.logger.error(f'An error occurred: {error}')
             return None
+
+    def send_messages(self, messages):
+        """Sends (to, subject, body) tuples in one batch HTTP request.
+
+        Returns one (response, error) pair per message, in order; error is
+        the HttpError (or other exception) for that message, else None.
+        """
+        if not self.service:
+            raise RuntimeError("Cannot send email: No valid service.")
+
+        results = [(None, None)] * len(messages)
+
+        def callback(request_id, response, exception):
+            results[int(request_id)] = (response, exception)
+
+        batch = self.service.new_batch_http_request(callback=callback)
+        for i, (to, subject, body) in enumerate(messages):
+            create_message = self._build_message(to, subject, body)
+            batch.add(self.service.users().messages().send(userId="me", body=create_message), request_id=str(i))
+        batch.execute()
+        return results
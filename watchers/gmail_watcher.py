@@ -1,60 +1,129 @@
 import os
+import time
 from datetime import datetime
 from pathlib import Path
 from base_watcher import BaseWatcher
+from vault_counters import VaultCounters
+from message_store import MessageStore
+from vault_document import format_frontmatter
 
 # Note: In a real scenario, you'd use google-api-python-client
 # For this hackathon deliverable, we provide the robust structure.
 
 class GmailWatcher(BaseWatcher):
-    def __init__(self, vault_path: str):
+    # Messages ingested per poll adapt to the measured fetch rate, so one
+    # poll's fetching takes about FETCH_BUDGET seconds; the rest stay pending
+    FETCH_BUDGET = 20.0
+    INITIAL_BATCH = 200
+    MIN_BATCH = 10
+    MAX_BATCH = 2000
+
+    def __init__(self, vault_path: str, gmail=None):
         super().__init__(vault_path, check_interval=60)
-        from gmail_service import GmailService
-        script_dir = Path(__file__).parent.resolve()
-        creds_path = script_dir / "gmail_credentials.json"
-        token_path = script_dir / "gmail_token.json"
-        self.gmail = GmailService(str(creds_path), str(token_path))
+        state_path = self.vault_path / "Logs" / "gmail_sync_state.json"
+        if gmail is None:
+            from gmail_service import GmailService
+            script_dir = Path(__file__).parent.resolve()
+            creds_path = script_dir / "gmail_credentials.json"
+            token_path = script_dir / "gmail_token.json"
+            gmail = GmailService(str(creds_path), str(token_path), state_path=str(state_path))
+        elif gmail.state_path is None:
+            gmail.state_path = str(state_path)
+        self.gmail = gmail
+        self.counters = VaultCounters(self.vault_path)
+        self.store = MessageStore(self.vault_path)
+        self.batch_size = self.INITIAL_BATCH
+        self.throughput = None  # messages per second, smoothed
         
     def check_for_updates(self) -> list:
         self.logger.info("Checking for new emails...")
         
-        # Only fetch emails from today to avoid "old unread" clutter
-        today = datetime.now().strftime('%Y/%m/%d')
-        msg_ids = self.gmail.list_unread_messages(query=f'is:unread after:{today}')
+        # New inbox mail since the last poll (one history request in the steady state)
+        msg_ids = self.gmail.sync()
         
         if not msg_ids:
-            self.logger.info("No new unread emails from today found.")
+            self.logger.info("No new emails found.")
             return []
             
-        self.logger.info(f"Detected {len(msg_ids)} unread emails from today.")
+        self.logger.info(f"Detected {len(msg_ids)} new emails.")
         
-        # Process up to 20 per cycle
-        process_limit = 20
+        # Messages already in the local store have their task; never download them again
+        batch_ids = msg_ids[:self.batch_size]
+        known = self.store.known(batch_ids)
+        new_ids = [msg_id for msg_id in batch_ids if msg_id not in known]
+        # Headers and snippet only, in parallel batches; bodies are fetched when a task is opened
+        start = time.monotonic()
+        fetched, rate_limited = self.gmail.get_messages(new_ids, format='metadata') if new_ids else ({}, [])
+        self.adapt_batch_size(len(new_ids), time.monotonic() - start, backlog=len(msg_ids) > len(batch_ids))
         messages = []
-        for msg_id in msg_ids[:process_limit]:
-            msg_content = self.gmail.get_message_content(msg_id)
+        for msg_id in new_ids:
+            msg_content = fetched.get(msg_id)
             if msg_content:
                 subject = msg_content.get('subject', 'No Subject')
                 self.logger.info(f"Processing: {subject}")
                 messages.append(msg_content)
-                self.gmail.mark_as_read(msg_id)
         
-        if messages:
-            self.logger.info(f"Successfully ingested {len(messages)} new emails.")
+        # Stored ids are done; the fetched ones are acknowledged by ingest() once their task exists.
+        # Throttled ids are not an attempt against the message: they just wait for the next poll.
+        throttled = set(rate_limited)
+        failed = [msg_id for msg_id in new_ids if msg_id not in fetched and msg_id not in throttled]
+        self.gmail.acknowledge(list(known), failed)
         
         return messages
+
+    def ingest(self, messages) -> list:
+        """Writes a task per message, then marks those read and drops them from pending.
+
+        A message whose task could not be written stays unread and pending,
+        so the next poll tries it again.
+        """
+        done, failed, paths = [], [], []
+        for message in messages:
+            try:
+                paths.append(self.create_action_file(message))
+                done.append(message['id'])
+            except Exception as e:
+                self.logger.error(f"Could not create task for email {message.get('id')}: {e}")
+                failed.append(message['id'])
+        if done:
+            self.gmail.mark_as_read(done)
+            self.logger.info(f"Successfully ingested {len(done)} new emails.")
+        if done or failed:
+            self.gmail.acknowledge(done, failed)
+        return paths
+
+    def run(self):
+        self.logger.info(f'Starting {self.__class__.__name__}')
+        while True:
+            try:
+                self.ingest(self.check_for_updates())
+            except Exception as e:
+                self.logger.error(f'Error: {e}')
+            time.sleep(self.check_interval)
     
+    def adapt_batch_size(self, fetched: int, elapsed: float, backlog: bool):
+        """Sizes the next poll's batch from the fetch rate seen so far."""
+        if fetched < self.MIN_BATCH or elapsed <= 0:
+            return
+        rate = fetched / elapsed
+        self.throughput = rate if self.throughput is None else 0.7 * self.throughput + 0.3 * rate
+        target = int(self.throughput * self.FETCH_BUDGET)
+        # Grow at most 2x per poll, and only while mail is actually waiting
+        if not backlog:
+            target = min(target, self.batch_size)
+        self.batch_size = max(self.MIN_BATCH, min(self.MAX_BATCH, target, 2 * self.batch_size))
+        self.logger.info(f"Fetched {fetched} emails at {rate:.0f}/s; next batch up to {self.batch_size}")
+
     def create_action_file(self, message) -> Path:
         # Implementation to convert Gmail message to .md in Needs_Action
-        content = f'''---
-type: email
-from: {message.get('from', 'Unknown')}
-subject: {message.get('subject', 'No Subject')}
-received: {datetime.now().isoformat()}
-priority: high
-status: pending
----
-
+        content = format_frontmatter({
+            'type': 'email',
+            'from': message.get('from', 'Unknown'),
+            'subject': message.get('subject', 'No Subject'),
+            'received': datetime.now().isoformat(),
+            'priority': 'high',
+            'status': 'pending',
+        }) + f'''
 ## Email Content
 {message.get('snippet', 'No content')}
 
@@ -63,7 +132,11 @@ status: pending
 - [ ] Archive after processing
 '''
         filepath = self.needs_action / f"EMAIL_{message.get('id', 'unknown')}.md"
+        is_new = not filepath.exists()
         filepath.write_text(content, encoding='utf-8')
+        self.store.put(message)
+        if is_new:
+            self.counters.adjust(active_tasks=1)
         return filepath
 
 if __name__ == "__main__":
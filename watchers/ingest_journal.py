@@ -0,0 +1,122 @@
+"""
+Append-only journal of files the orchestrator has handled.
+Each line records a file's folder/name, size, mtime and sha256, so a
+restart can tell from a stat alone which files are new, and a file dropped
+again under the same name with the same content (a re-drop) is recognized
+by its hash.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("IngestJournal")
+
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def file_digest(path: Path):
+    """sha256 of path's content, read in blocks."""
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(HASH_BLOCK_SIZE), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class IngestJournal:
+    """Which vault files were handled, keyed by path + stat and by path + content hash."""
+
+    def __init__(self, vault_path: Path, journal_path: Path = None):
+        self.vault_path = Path(vault_path).resolve()
+        self.journal_path = journal_path or self.vault_path / "Logs" / "ingest_journal.jsonl"
+        self.journal_path.parent.mkdir(parents=True, exist_ok=True)
+        self.is_new = not self.journal_path.exists()
+
+        self._entries = {}     # "Folder/name" -> (size, mtime_ns)
+        self._hashes = set()   # ("Folder/name", sha256)
+        self._claimed = set()
+        self._lock = threading.Lock()
+        self._load()
+        self._file = open(self.journal_path, "a", encoding="utf-8")
+
+    def _key(self, path: Path):
+        return Path(path).resolve().relative_to(self.vault_path).as_posix()
+
+    def _load(self):
+        if self.is_new:
+            return
+        lines = 0
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # Torn last line from a crash
+                lines += 1
+                self._entries[record["path"]] = (record["size"], record["mtime_ns"])
+                if record.get("sha256"):
+                    self._hashes.add((record["path"], record["sha256"]))
+        if lines > 2 * len(self._entries) + 1000:
+            self._compact()
+
+    def _compact(self):
+        """Rewrites the journal with one line per path."""
+        tmp_path = self.journal_path.with_name(self.journal_path.name + ".tmp")
+        latest = {}
+        with open(self.journal_path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue
+                latest[record["path"]] = record
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            for record in latest.values():
+                f.write(json.dumps(record) + "\n")
+        os.replace(tmp_path, self.journal_path)
+        logger.info(f"Compacted ingest journal to {len(latest)} entries")
+
+    def seen(self, path: Path, stat: os.stat_result):
+        """True if path was handled with exactly this size and mtime."""
+        with self._lock:
+            return self._entries.get(self._key(path)) == (stat.st_size, stat.st_mtime_ns)
+
+    def claim(self, path: Path, stat: os.stat_result):
+        """Marks path as in progress; False if it is already handled or being handled."""
+        key = self._key(path)
+        with self._lock:
+            if key in self._claimed or self._entries.get(key) == (stat.st_size, stat.st_mtime_ns):
+                return False
+            self._claimed.add(key)
+            return True
+
+    def release(self, path: Path):
+        """Gives up a claim without recording it, so the file is retried later."""
+        with self._lock:
+            self._claimed.discard(self._key(path))
+
+    def has_content(self, path: Path, digest: str):
+        """True if a file of this name in this folder was handled with the same content."""
+        with self._lock:
+            return (self._key(path), digest) in self._hashes
+
+    def record(self, path: Path, stat: os.stat_result, digest: str = None, action: str = "processed"):
+        key = self._key(path)
+        entry = {"path": key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+                 "sha256": digest, "action": action, "at": time.strftime("%Y-%m-%dT%H:%M:%S")}
+        with self._lock:
+            self._file.write(json.dumps(entry) + "\n")
+            self._file.flush()
+            self._entries[key] = (stat.st_size, stat.st_mtime_ns)
+            if digest:
+                self._hashes.add((key, digest))
+            self._claimed.discard(key)
+
+    def close(self):
+        with self._lock:
+            self._file.close()
@@ -0,0 +1,233 @@
+"""
+Keyword classifier for task type and priority.
+Every keyword of every category and priority tier is compiled into one
+trie-shaped regex (the keyword automaton), so a document is classified in
+a single pass over its text, streamed in lowercased chunks, instead of
+one substring scan per keyword. Matches may overlap, so every keyword the
+old per-keyword substring checks found is still seen. The scan stops as
+soon as the result cannot change.
+
+The taxonomy can be edited in Company_Handbook.md under
+'### Task Classification' and '### Priority Keywords', one
+'- Name: keyword, keyword' line per entry, highest precedence first.
+
+Benchmark:
+    python keyword_classifier.py --mb 8
+"""
+
+import re
+import time
+import argparse
+from itertools import islice
+from pathlib import Path
+
+CHUNK_SIZE = 256 * 1024
+
+# (task type, keywords, suggested actions), first match wins
+DEFAULT_CATEGORIES = [
+    ('💰 Financial Task', ['invoice', 'payment', 'bill', 'receipt'],
+     ['Review payment details', 'Verify amount and recipient', 'Process payment or forward to accounting']),
+    ('📅 Scheduling Task', ['meeting', 'schedule', 'appointment', 'calendar'],
+     ['Check calendar availability', 'Send meeting invite', 'Prepare agenda']),
+    ('✉️ Communication Task', ['email', 'reply', 'message', 'contact'],
+     ['Draft response', 'Review and send', 'Follow up if needed']),
+    ('📊 Report/Analysis Task', ['report', 'analysis', 'summary', 'review'],
+     ['Gather required data', 'Create analysis or summary', 'Review and finalize']),
+    ('🛒 Shopping/Purchase Task', ['buy', 'purchase', 'shopping', 'groceries'],
+     ['Create shopping list', 'Compare prices', 'Make purchase']),
+]
+FALLBACK_CATEGORY = ('📋 General Task', ['Review task details', 'Determine next steps', 'Execute or delegate'])
+
+# (priority, keywords, estimated time), highest first
+DEFAULT_PRIORITIES = [
+    ('🔴 HIGH', ['urgent', 'asap', 'emergency', 'immediately'], 'Today'),
+    ('🟡 MEDIUM', ['important', 'priority', 'soon'], 'This week'),
+]
+FALLBACK_PRIORITY = ('🟢 NORMAL', 'When possible')
+
+KEYWORD_COUNT = 5
+KEYWORD_PATTERN = re.compile(r"\S{4,}")
+
+
+def _handbook_section(text: str, title: str):
+    """'- Name: a, b' entries under a '### title' heading, as [(name, [a, b])]."""
+    entries = []
+    in_section = False
+    for line in text.splitlines():
+        stripped = line.strip()
+        if stripped.startswith("#"):
+            in_section = stripped.lstrip("#").strip().lower() == title.lower()
+            continue
+        if in_section and stripped.startswith("- ") and ":" in stripped:
+            name, _, keywords = stripped[2:].rpartition(":")
+            words = [w.strip().lower() for w in keywords.split(",") if w.strip()]
+            if name.strip() and words:
+                entries.append((name.strip(), words))
+    return entries
+
+
+def load_taxonomy(handbook_path: Path = None):
+    """(categories, priorities) from the handbook, falling back to the defaults."""
+    categories, priorities = DEFAULT_CATEGORIES, DEFAULT_PRIORITIES
+    if handbook_path is None or not handbook_path.exists():
+        return categories, priorities
+    text = handbook_path.read_text(encoding='utf-8', errors='ignore')
+
+    actions = {name: acts for name, _, acts in DEFAULT_CATEGORIES}
+    times = {name: when for name, _, when in DEFAULT_PRIORITIES}
+    section = _handbook_section(text, "Task Classification")
+    if section:
+        categories = [(name, words, actions.get(name, FALLBACK_CATEGORY[1])) for name, words in section]
+    section = _handbook_section(text, "Priority Keywords")
+    if section:
+        priorities = [(name, words, times.get(name, 'This week')) for name, words in section]
+    return categories, priorities
+
+
+def _trie_pattern(words):
+    """Regex matching any of words, factored on common prefixes ('b(?:ill|uy)')."""
+    root = {}
+    for word in words:
+        node = root
+        for ch in word:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def emit(node):
+        branches = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not branches:
+            return ""
+        if "" in node:
+            # A keyword ends here; the greedy '?' still prefers the longer one
+            return "(?:" + "|".join(branches) + ")?"
+        return branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+
+    return emit(root)
+
+
+class KeywordClassifier:
+    """Classifies text into one task type and one priority in a single pass."""
+
+    def __init__(self, categories=None, priorities=None):
+        self.categories = categories or DEFAULT_CATEGORIES
+        self.priorities = priorities or DEFAULT_PRIORITIES
+
+        # keyword -> (kind, rank); a lower rank takes precedence
+        self._owner = {}
+        for kind, table in (("type", self.categories), ("priority", self.priorities)):
+            for rank, (_, words, _) in enumerate(table):
+                for word in words:
+                    self._owner.setdefault(word.lower(), (kind, rank))
+        # The trie matches the longest keyword at a position; the shorter
+        # keywords that are prefixes of it ('bill' in 'billing') match there too
+        self._hits = {word: [self._owner[word[:n]] for n in range(1, len(word) + 1) if word[:n] in self._owner]
+                      for word in self._owner}
+        # Matched as substrings, like the old 'word in text' checks
+        self._pattern = re.compile(_trie_pattern(self._owner))
+        self._overlap = max(map(len, self._owner)) - 1
+
+    def scan(self, chunks):
+        """Best (type rank, priority rank) over an iterable of text chunks; None where nothing matched."""
+        best = {"type": None, "priority": None}
+        tail = ""
+        for chunk in chunks:
+            # Carry the end of the previous chunk so keywords split across chunks are found
+            text = tail + chunk.lower()
+            search = self._pattern.search
+            match = search(text)
+            while match:
+                for kind, rank in self._hits[match.group()]:
+                    if best[kind] is None or rank < best[kind]:
+                        best[kind] = rank
+                        if best["type"] == 0 and best["priority"] == 0:
+                            return best["type"], best["priority"]
+                # Resume one character on, so keywords overlapping this one are found too
+                match = search(text, match.start() + 1)
+            tail = text[-self._overlap:] if self._overlap else ""
+        return best["type"], best["priority"]
+
+    def classify(self, content, keyword_count: int = KEYWORD_COUNT, sample: str = ""):
+        """The analysis dict used by the watcher.
+
+        content is a str or an iterable of text chunks; for chunks, keywords
+        are taken from sample (the start of the text).
+        """
+        chunks = _chunks(content) if isinstance(content, str) else content
+        type_rank, priority_rank = self.scan(chunks)
+
+        if type_rank is None:
+            task_type, actions = FALLBACK_CATEGORY
+        else:
+            task_type, _, actions = self.categories[type_rank]
+        if priority_rank is None:
+            priority, estimated_time = FALLBACK_PRIORITY
+        else:
+            priority, _, estimated_time = self.priorities[priority_rank]
+
+        keywords = extract_keywords(content if isinstance(content, str) else sample, keyword_count)
+        return {
+            'task_type': task_type,
+            'priority': priority,
+            'keywords': keywords,
+            'estimated_time': estimated_time,
+            'suggested_actions': list(actions),
+        }
+
+
+def _chunks(text: str, size: int = CHUNK_SIZE):
+    for start in range(0, len(text), size):
+        yield text[start:start + size]
+
+
+def extract_keywords(content: str, count: int = KEYWORD_COUNT):
+    """The first count words longer than 3 characters; stops reading after the last one."""
+    return [m.group() for m in islice(KEYWORD_PATTERN.finditer(content), count)]
+
+
+def _legacy_analyze(content: str):
+    """The previous per-keyword-list implementation, kept for the benchmark."""
+    content_lower = content.lower()
+    task_type = FALLBACK_CATEGORY[0]
+    for name, words, _ in DEFAULT_CATEGORIES:
+        if any(word in content_lower for word in words):
+            task_type = name
+            break
+    priority = FALLBACK_PRIORITY[0]
+    for name, words, _ in DEFAULT_PRIORITIES:
+        if any(word in content_lower for word in words):
+            priority = name
+            break
+    keywords = [w for w in content.split() if len(w) > 3][:KEYWORD_COUNT]
+    return task_type, priority, keywords
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mb", type=float, default=8, help="Size of each synthetic document")
+    args = parser.parse_args()
+
+    filler = "Lorem ipsum dolor sit amet, consectetur adipiscing elit. "
+    size = int(args.mb * 1024 * 1024)
+    documents = {
+        # No keywords at all: both implementations read everything
+        "no keywords": (filler * (size // len(filler) + 1))[:size],
+        # Decisive keywords near the start: the single pass stops early
+        "early match": "URGENT invoice attached. " + (filler * (size // len(filler) + 1))[:size],
+        # Weak keywords at the end
+        "late match": (filler * (size // len(filler) + 1))[:size] + " please buy groceries soon",
+    }
+    classifier = KeywordClassifier()
+    for label, text in documents.items():
+        start = time.perf_counter()
+        old = _legacy_analyze(text)
+        legacy = time.perf_counter() - start
+        start = time.perf_counter()
+        result = classifier.classify(text)
+        single = time.perf_counter() - start
+        agree = old == (result['task_type'], result['priority'], result['keywords'])
+        print(f"{label:<12} {args.mb:.0f} MB  legacy {legacy * 1000:8.1f} ms  single-pass {single * 1000:8.1f} ms  "
+              f"same result: {agree}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+Local store of Gmail messages, keyed by message id.
+The watcher records each message's headers and snippet here when it
+creates the email task, so a message is never downloaded twice. Full
+bodies are only fetched when a task is first opened in the dashboard,
+and are cached here from then on, together with the message's attachment
+list (the attachments themselves are downloaded on request).
+"""
+
+import time
+import json
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("MessageStore")
+
+
+class MessageStore:
+    """SQLite table of message metadata with lazily filled bodies."""
+
+    def __init__(self, vault_path: Path, db_path: Path = None):
+        self.vault_path = Path(vault_path)
+        self.db_path = db_path or self.vault_path / "Logs" / "gmail_messages.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS messages (
+                id TEXT PRIMARY KEY, thread_id TEXT, sender TEXT, subject TEXT, date TEXT,
+                snippet TEXT, labels TEXT, stored_at REAL, body TEXT, body_fetched_at REAL, attachments TEXT)""")
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(messages)")}
+            if "attachments" not in columns:
+                # Stores created before attachment lists were kept
+                conn.execute("ALTER TABLE messages ADD COLUMN attachments TEXT")
+
+    def _connect(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def known(self, msg_ids):
+        """The subset of msg_ids already stored."""
+        msg_ids = list(msg_ids)
+        found = set()
+        conn = self._connect()
+        # Stay under SQLite's bound-parameter limit
+        for start in range(0, len(msg_ids), 500):
+            chunk = msg_ids[start:start + 500]
+            rows = conn.execute(f"SELECT id FROM messages WHERE id IN ({','.join('?' * len(chunk))})", chunk)
+            found.update(row[0] for row in rows)
+        return found
+
+    def put(self, message: dict):
+        """Stores a parsed message (see GmailService._parse_message); keeps any cached body."""
+        with self._connect() as conn:
+            conn.execute("""INSERT INTO messages (id, thread_id, sender, subject, date, snippet, labels, stored_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET thread_id=excluded.thread_id, sender=excluded.sender,
+                    subject=excluded.subject, date=excluded.date, snippet=excluded.snippet, labels=excluded.labels""",
+                (message["id"], message.get("thread_id", ""), message.get("from", ""), message.get("subject", ""),
+                 message.get("date", ""), message.get("snippet", ""), json.dumps(message.get("labels", [])),
+                 time.time()))
+            if message.get("body"):
+                self._set_body(conn, message["id"], message["body"], message.get("attachments"))
+
+    def get(self, msg_id: str):
+        """The stored message as a dict, body None if not fetched yet; None if unknown."""
+        row = self._connect().execute(
+            "SELECT id, thread_id, sender, subject, date, snippet, labels, body FROM messages WHERE id = ?",
+            (msg_id,)).fetchone()
+        if row is None:
+            return None
+        return {"id": row[0], "thread_id": row[1], "from": row[2], "subject": row[3], "date": row[4],
+                "snippet": row[5], "labels": json.loads(row[6] or "[]"), "body": row[7]}
+
+    def has_body(self, msg_id: str):
+        row = self._connect().execute("SELECT body IS NOT NULL FROM messages WHERE id = ?", (msg_id,)).fetchone()
+        return bool(row and row[0])
+
+    def body(self, msg_id: str):
+        row = self._connect().execute("SELECT body FROM messages WHERE id = ?", (msg_id,)).fetchone()
+        return row[0] if row else None
+
+    def attachments(self, msg_id: str):
+        """Attachment descriptors saved with the body (see mime_walker.list_attachments)."""
+        row = self._connect().execute("SELECT attachments FROM messages WHERE id = ?", (msg_id,)).fetchone()
+        return json.loads(row[0]) if row and row[0] else []
+
+    def set_body(self, msg_id: str, body: str, attachments=None):
+        with self._connect() as conn:
+            self._set_body(conn, msg_id, body, attachments)
+
+    def _set_body(self, conn, msg_id, body, attachments=None):
+        attachments = json.dumps(attachments or [])
+        updated = conn.execute("UPDATE messages SET body = ?, body_fetched_at = ?, attachments = ? WHERE id = ?",
+                               (body, time.time(), attachments, msg_id)).rowcount
+        if not updated:
+            conn.execute("""INSERT OR IGNORE INTO messages (id, stored_at, body, body_fetched_at, attachments)
+                VALUES (?, ?, ?, ?, ?)""", (msg_id, time.time(), body, time.time(), attachments))
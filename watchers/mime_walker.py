@@ -0,0 +1,183 @@
+"""
+Decoding of Gmail API message payloads.
+The MIME tree is walked recursively, so bodies nested in multipart/mixed,
+multipart/alternative or multipart/related parts are found. Text parts
+are decoded with their declared charset, in fixed-size base64 slices, and
+stop once the body cap is reached. HTML-only mail is converted to text.
+Attachments are only listed here; GmailService.save_attachment streams
+them to disk.
+"""
+
+import os
+import base64
+import codecs
+from email.message import Message
+from html.parser import HTMLParser
+
+# Decoded body cap in characters; override with GMAIL_MAX_BODY_CHARS
+MAX_BODY_CHARS = int(os.environ.get("GMAIL_MAX_BODY_CHARS", 256 * 1024))
+# base64 characters decoded per step; a multiple of 4
+B64_CHUNK = 64 * 1024
+TRUNCATED_NOTE = "\n\n[... message truncated ...]"
+
+
+def _headers(part):
+    message = Message()
+    for header in part.get("headers", []):
+        message[header["name"]] = header["value"]
+    return message
+
+
+def _charset(part):
+    charset = _headers(part).get_content_charset() or "utf-8"
+    try:
+        return codecs.lookup(charset).name
+    except LookupError:
+        return "utf-8"
+
+
+def is_attachment(part):
+    if part.get("filename") or part.get("body", {}).get("attachmentId"):
+        return True
+    return _headers(part).get_content_disposition() == "attachment"
+
+
+def walk(payload):
+    """Every leaf part of the MIME tree, depth first, in message order."""
+    parts = payload.get("parts")
+    if not parts:
+        yield payload
+        return
+    for part in parts:
+        yield from walk(part)
+
+
+def b64_chunks(data: str, chunk: int = B64_CHUNK):
+    """Decoded bytes of a base64url string, one slice at a time."""
+    for start in range(0, len(data), chunk):
+        piece = data[start:start + chunk]
+        # Gmail may drop the padding on the last slice
+        yield base64.urlsafe_b64decode(piece + "=" * (-len(piece) % 4))
+
+
+def b64_decode_stream(pieces):
+    """Decoded bytes of base64url data arriving as byte pieces of any length."""
+    carry = b""
+    for piece in pieces:
+        data = carry + piece
+        cut = len(data) - len(data) % 4
+        carry = data[cut:]
+        if cut:
+            yield base64.urlsafe_b64decode(data[:cut])
+    if carry:
+        yield base64.urlsafe_b64decode(carry + b"=" * (-len(carry) % 4))
+
+
+def decode_text(data: str, charset: str = "utf-8", max_chars: int = MAX_BODY_CHARS):
+    """(text, truncated) of a base64url text part, decoding at most about max_chars."""
+    decoder = codecs.getincrementaldecoder(charset)(errors="replace")
+    parts = []
+    count = 0
+    for raw in b64_chunks(data):
+        text = decoder.decode(raw)
+        parts.append(text)
+        count += len(text)
+        if count > max_chars:
+            return "".join(parts)[:max_chars], True
+    parts.append(decoder.decode(b"", final=True))
+    return "".join(parts), False
+
+
+class _TextExtractor(HTMLParser):
+    SKIP = {"script", "style", "head", "title"}
+    BLOCKS = {"p", "div", "br", "tr", "li", "h1", "h2", "h3", "h4", "h5", "h6", "table", "blockquote", "hr"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.parts = []
+        self._skip = 0
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip += 1
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip = max(0, self._skip - 1)
+        elif tag in self.BLOCKS:
+            self.parts.append("\n")
+
+    def handle_data(self, data):
+        if not self._skip:
+            self.parts.append(data)
+
+
+def html_to_text(html: str):
+    """Readable text from an HTML body: tags and scripts dropped, blocks on their own lines."""
+    extractor = _TextExtractor()
+    extractor.feed(html)
+    extractor.close()
+    lines = (" ".join(line.split()) for line in "".join(extractor.parts).splitlines())
+    text = "\n".join(lines)
+    while "\n\n\n" in text:
+        text = text.replace("\n\n\n", "\n\n")
+    return text.strip()
+
+
+def extract_body(payload, max_chars: int = MAX_BODY_CHARS):
+    """(body text, truncated) of a message payload.
+
+    All inline text/plain parts are joined in order; when there are none,
+    the text/html parts are converted instead.
+    """
+    plain, html = [], []
+    for part in walk(payload):
+        if is_attachment(part):
+            continue
+        mime_type = part.get("mimeType", "").lower()
+        if mime_type == "text/plain":
+            plain.append(part)
+        elif mime_type == "text/html":
+            html.append(part)
+
+    texts = []
+    count = 0
+    truncated = False
+    for part in plain or html:
+        data = part.get("body", {}).get("data")
+        if not data:
+            continue
+        if plain:
+            text, cut = decode_text(data, _charset(part), max_chars - count)
+        else:
+            # Markup is mostly tags; allow more raw HTML than the text cap
+            raw, cut = decode_text(data, _charset(part), 4 * (max_chars - count))
+            text = html_to_text(raw)
+            if len(text) > max_chars - count:
+                text, cut = text[:max_chars - count], True
+        texts.append(text)
+        count += len(text)
+        if cut:
+            truncated = True
+            break
+    body = "\n\n".join(t for t in texts if t.strip())
+    return (body + TRUNCATED_NOTE, True) if truncated else (body, False)
+
+
+def list_attachments(payload):
+    """Attachment descriptors: filename, mime_type, size, and attachment_id or inline data."""
+    attachments = []
+    for part in walk(payload):
+        if not is_attachment(part):
+            continue
+        body = part.get("body", {})
+        attachments.append({
+            "filename": part.get("filename") or f"part-{part.get('partId', len(attachments))}",
+            "mime_type": part.get("mimeType", "application/octet-stream"),
+            "size": body.get("size", 0),
+            "attachment_id": body.get("attachmentId"),
+            "data": body.get("data"),
+        })
+    return attachments
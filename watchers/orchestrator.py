@@ -1,7 +1,10 @@
 import os
 import time
 import shutil
+import hashlib
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from watchdog.observers import Observer
 from watchdog.events import FileSystemEventHandler
@@ -25,113 +28,281 @@ logger = logging.getLogger("Orchestrator")
 
 import re
 from gmail_service import GmailService
+from vault_counters import VaultCounters
+from vault_document import format_frontmatter, write_document
+from file_readiness import WriteCompletionDetector
+from dashboard_writer import DashboardWriter
+from ingest_journal import IngestJournal, file_digest
+from commands import CommandRouter
+from outbox import Outbox, GmailTransport
+from text_reader import TextFile
+from blob_store import BlobStore
+
+# Worker threads per watched folder. Inbox items do the slow work (reads,
+# Gmail sends); the other folders only move files or update metrics.
+FOLDER_WORKERS = {"Inbox": 4, "Approved": 2, "Rejected": 1, "Done": 1}
+
+# Text read from an Inbox file for commands and their bodies
+COMMAND_TEXT_CHARS = 1024 * 1024
+
+# Sentences kept by the summarize command
+SUMMARY_SENTENCES = 3
+
+# Seconds between sweeps of blobs no task refers to any more
+BLOB_GC_INTERVAL = 600
 
 class GlobalEventHandler(FileSystemEventHandler):
-    def __init__(self, vault_path: Path):
+    def __init__(self, vault_path: Path, folder_workers: dict = None):
         self.vault_path = vault_path
         self.dashboard_path = vault_path / "Dashboard.md"
+        self.counters = VaultCounters(vault_path)
+        self.dashboard = DashboardWriter(self.dashboard_path)
+        self.journal = IngestJournal(vault_path)
+        self.blobs = BlobStore(vault_path)
         
-        # Initialize Gmail Service
+        # Initialize Gmail Service (googleapiclient is not thread-safe, so sends are serialized)
         creds_path = SCRIPT_DIR / "gmail_credentials.json"
         token_path = SCRIPT_DIR / "gmail_token.json"
         self.gmail = GmailService(str(creds_path), str(token_path))
+        self._gmail_lock = threading.Lock()
+        self.outbox = Outbox(vault_path / "Outbox", GmailTransport(self.gmail, self._gmail_lock),
+                             on_failed=self.mail_failed)
+        self.outbox.start()
 
-    def on_created(self, event):
-        if event.is_directory:
-            return
-        
-        path = Path(event.src_path).resolve()
+        # Commands in Inbox files, compiled once; see commands.py
+        self.commands = CommandRouter()
+        self.commands.on("send_mail", self.command_send_mail)
+        self.commands.on("schedule", self.command_schedule)
+        self.commands.on("summarize", self.command_summarize)
+
+        self.handlers = {
+            'Inbox': self.handle_inbox,
+            'Approved': self.handle_approval,
+            'Rejected': self.handle_rejection,
+            'Done': self.handle_completion,
+        }
+        # One bounded pool per folder gives per-folder concurrency limits
+        self.pools = {
+            folder: ThreadPoolExecutor(max_workers=n, thread_name_prefix=f"{folder}Worker")
+            for folder, n in (folder_workers or FOLDER_WORKERS).items()
+        }
+        self.readiness = WriteCompletionDetector(self.enqueue, new_only=True)
+
+    def on_any_event(self, event):
+        # Runs on watchdog's single dispatch thread: only hand the event on, never block here.
+        # The readiness detector reports each file once its write is complete.
+        self.readiness.feed(event)
+
+    def enqueue(self, path):
+        path = Path(path).resolve()
         # Determine which folder it's in by comparing with vault subfolders
         folder = path.parent.name
         filename = path.name
 
+        pool = self.pools.get(folder)
+        if pool is None:
+            return
         logger.info(f"Event in {folder}: {filename}")
-        
-        # Add a delay for file completion (Obsidian and other apps write in steps)
-        time.sleep(2)
-
-        if folder == 'Inbox':
-            self.handle_inbox(path)
-        elif folder == 'Approved':
-            self.handle_approval(path)
-        elif folder == 'Rejected':
-            self.handle_rejection(path)
-        elif folder == 'Done':
-            self.handle_completion(path)
-
-    def handle_inbox(self, path):
+        pool.submit(self.process, folder, path)
+
+    def process(self, folder, path):
+        """Worker entry point for one completed file; each file is handled once."""
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            return
+        if not self.journal.claim(path, stat):
+            return
+        try:
+            digest = file_digest(path)
+            if folder == "Inbox" and self.is_redrop(path, stat, digest):
+                # Same name and content as a file already handled: archive it instead of a second task
+                archive = self.vault_path / "Logs" / "Archive" / "Duplicates"
+                archive.mkdir(parents=True, exist_ok=True)
+                shutil.move(str(path), str(archive / f"{time.strftime('%Y%m%d_%H%M%S')}_{path.name}"))
+                logger.info(f"Skipped re-drop of Inbox/{path.name}: same content was already processed; archived it")
+                self.journal.record(path, stat, digest, action="duplicate")
+                return
+            if folder == "Inbox":
+                # Already hashed: the blob store reuses the digest
+                self.handle_inbox(path, digest)
+            else:
+                self.handlers[folder](path)
+            self.journal.record(path, stat, digest)
+        except FileNotFoundError:
+            # Taken by another watcher (filesystem_watcher also consumes Inbox files) or moved away
+            logger.info(f"{folder}/{path.name} is gone; another watcher already handled it")
+            self.journal.record(path, stat, action="taken")
+        except Exception as e:
+            self.journal.release(path)
+            logger.error(f"Unhandled error processing {folder}/{path.name}: {e}")
+
+    def is_redrop(self, path, stat, digest):
+        """True if path repeats an Inbox file already handled under the same name with the same content.
+
+        Empty files and chat messages are never re-drops: every chat message
+        is a new request, even when its text repeats an earlier one.
+        """
+        if stat.st_size == 0 or path.name.startswith("CHAT_"):
+            return False
+        return self.journal.has_content(path, digest)
+
+    def catch_up(self):
+        """Queues files that arrived while the orchestrator was not running."""
+        baseline = self.journal.is_new
+        queued = 0
+        for folder in self.pools:
+            folder_path = self.vault_path / folder
+            if not folder_path.exists():
+                continue
+            with os.scandir(folder_path) as entries:
+                for entry in entries:
+                    if entry.name.startswith(".") or not entry.is_file():
+                        continue
+                    path = Path(entry.path)
+                    stat = entry.stat()
+                    if baseline:
+                        # First run with a journal: what is already here was handled before
+                        digest = file_digest(path) if folder == "Inbox" else None
+                        self.journal.record(path, stat, digest, action="baseline")
+                    elif not self.journal.seen(path, stat):
+                        self.enqueue(path)
+                        queued += 1
+        if baseline:
+            self.journal.is_new = False
+            logger.info("Ingest journal created; existing files recorded as baseline.")
+        else:
+            logger.info(f"Startup catch-up queued {queued} files.")
+
+    def shutdown(self):
+        """Finish queued work and stop the worker pools."""
+        self.readiness.stop()
+        for pool in self.pools.values():
+            pool.shutdown(wait=True)
+        self.outbox.stop()
+        self.dashboard.close()
+        self.journal.close()
+
+    def handle_inbox(self, path, digest=None):
         abs_path = str(path.absolute())
         logger.info(f"Ingesting from Inbox. Full path: {abs_path}")
         
-        # Robust content reading: Wait for content to appear (up to 5 attempts)
+        # The readiness detector only hands us files whose write has completed
         content = ""
-        for i in range(5):
-            try:
-                if not path.exists():
-                    logger.warning(f"File {path.name} disappeared before processing.")
-                    return
-                
-                # Check size first
-                size = os.path.getsize(path)
-                logger.info(f"File {path.name} current size: {size} bytes")
-                
-                if size > 0:
-                    content = path.read_text(encoding='utf-8', errors='ignore').strip()
-                    if content:
-                        break
-                
-                logger.warning(f"File {path.name} is empty or unreadable. Attempt {i+1}/5, retrying in 1s...")
-                time.sleep(1)
-            except Exception as e:
-                logger.warning(f"Could not read {path.name} (locked?): {e}. Retrying...")
-                time.sleep(1)
+        try:
+            text = TextFile(path)
+            logger.info(f"File {path.name} current size: {text.size} bytes ({text.encoding or 'binary'})")
+            # Commands sit in the first lines; never load more than COMMAND_TEXT_CHARS
+            content = text.head(COMMAND_TEXT_CHARS).strip()
+        except FileNotFoundError:
+            logger.warning(f"File {path.name} disappeared before processing.")
+            return
+        except Exception as e:
+            logger.warning(f"Could not read {path.name}: {e}")
 
         if not content:
-            logger.error(f"File {path.name} still empty after retries. Skipping command detection.")
+            logger.error(f"File {path.name} is empty or unreadable. Skipping command detection.")
         else:
-            try:
-                # Command pattern: write mail to (name/email): (message)
-                match = re.search(r'write mail to\s+([\w\.-]+@[\w\.-]+\.\w+|[\w\s]+)[:\s]+(.*)', content, re.IGNORECASE | re.DOTALL)
-                
-                if match:
-                    recipient = match.group(1).strip()
-                    message_body = match.group(2).strip()
-                    logger.info(f"Detected email command: to={recipient}, body={message_body[:50]}...")
-                
-                    # Check if it's an email address or a name (for now we require email or specific known addresses)
-                    # If it's not an email, we could look it up in a contact list (future feature)
-                    if '@' not in recipient:
-                        logger.warning(f"Recipient '{recipient}' is not a valid email address. Skipping auto-send.")
-                    else:
-                        logger.info(f"Sending email to {recipient}...")
-                        result = self.gmail.send_message(recipient, f"Message from AI Employee", message_body)
-                        if result:
-                            logger.info(f"Successfully sent email to {recipient}")
-                            # Move to Done immediately for auto-executed commands
-                            dest = self.vault_path / "Done" / path.name
-                            shutil.move(str(path), str(dest))
-                            self.update_dashboard_metric("Active Tasks", 0) # No change needed to active tasks if it goes straight to done
-                            return
-
-            except Exception as e:
-                logger.error(f"Error processing inbox file for commands: {e}")
+            commands = self.commands.parse(content)
+            if commands:
+                logger.info(f"Detected commands in {path.name}: {', '.join(c.name for c in commands)}")
+            if self.commands.dispatch(commands, path):
+                # Every command was carried out: the file itself needs no review
+                dest = self.vault_path / "Done" / path.name
+                shutil.move(str(path), str(dest))
+                self.counters.adjust(completed_tasks=1)
+                return
 
         dest = self.vault_path / "Needs_Action" / f"FILE_{path.name}"
-        shutil.copy2(path, dest)
+        try:
+            # Stored once by content and linked into Needs_Action; the Inbox original is consumed
+            self.blobs.ingest(path, dest, digest=digest)
+        except FileNotFoundError:
+            logger.info(f"{path.name} was already taken from the Inbox")
+            return
         
-        # Create metadata
-        meta_path = dest.with_suffix(".md")
-        meta_path.write_text(f"---\ntype: ingestion\nstatus: pending\ntimestamp: {time.ctime()}\n---\n# New Task: {path.name}\nPlease process this file.", encoding='utf-8')
+        # Create metadata (a separate file: never written through the payload's link)
+        meta_path = dest.with_suffix(".md") if dest.suffix != ".md" else dest.with_name(f"{dest.name}.md")
+        header = format_frontmatter({"type": "ingestion", "status": "pending", "timestamp": time.ctime()})
+        write_document(meta_path, f"{header}# New Task: {path.name}\nPlease process this file.")
+        self.counters.adjust(active_tasks=1)
+        self.update_dashboard_metric("Active Tasks", 1)
+
+    def command_send_mail(self, command, path):
+        recipient = command.args.get("recipient") or command.args.get("name", "")
+        message_body = "\n".join(part for part in (command.args.get("message"), command.body) if part)
+        logger.info(f"Detected email command: to={recipient}, body={message_body[:50]}...")
+
+        # Check if it's an email address or a name (for now we require email or specific known addresses)
+        # If it's not an email, we could look it up in a contact list (future feature)
+        if '@' not in recipient:
+            logger.warning(f"Recipient '{recipient}' is not a valid email address. Skipping auto-send.")
+            return False
+        # Sent by the outbox worker; a slow or failing API never blocks ingestion
+        if not self.outbox.enqueue(recipient, "Message from AI Employee", message_body, source=path.name).queued:
+            # Still pending or sent moments ago: this file repeats a request already carried out
+            logger.info(f"Same mail to {recipient} is already queued or was just sent; not sending it twice.")
+        return True
+
+    def mail_failed(self, key, message):
+        """The outbox gave up on a send: file it as a task so it is not silently dropped."""
+        dest = self.vault_path / "Needs_Action" / f"MAIL_FAILED_{key}.md"
+        header = format_frontmatter({"type": "mail_failed", "to": message["to"], "subject": message["subject"],
+                                     "source": message.get("source") or "", "attempts": message["attempts"],
+                                     "priority": "high", "status": "pending", "timestamp": time.ctime()})
+        write_document(dest, f"{header}# Mail not sent: {message['to']}\n"
+                             f"Gave up after {message['attempts']} attempts: {message.get('last_error', '')}\n\n"
+                             f"## Message\n{message['body']}\n\n"
+                             f"## Suggested Actions\n- [ ] Check the address and resend from the chat\n")
+        logger.error(f"Mail to {message['to']} could not be sent; filed {dest.name}")
+        self.counters.adjust(active_tasks=1)
+        self.update_dashboard_metric("Active Tasks", 1)
+
+    def command_schedule(self, command, path):
+        what = command.args["what"]
+        when = command.args.get("when", "unspecified")
+        dest = self.vault_path / "Needs_Action" / f"SCHEDULE_{path.stem}_{hashlib.sha1(f'{what}|{when}'.encode()).hexdigest()[:8]}.md"
+        header = format_frontmatter({"type": "schedule", "what": what, "when": when,
+                                     "source": path.name, "status": "pending", "timestamp": time.ctime()})
+        dest.write_text(f"{header}# Schedule: {what}\nWhen: {when}\n\n{command.body}\n", encoding='utf-8')
+        logger.info(f"Created schedule request {dest.name}")
+        self.counters.adjust(active_tasks=1)
         self.update_dashboard_metric("Active Tasks", 1)
+        return True
+
+    def command_summarize(self, command, path):
+        text = command.body
+        target = command.args.get("what")
+        if target:
+            # "summarize <file>" refers to a task or document in the vault
+            for folder in ("Needs_Action", "Inbox", "Done"):
+                candidate = self.vault_path / folder / Path(target).name
+                if candidate.is_file():
+                    text = TextFile(candidate).head(COMMAND_TEXT_CHARS)
+                    break
+        if not text.strip():
+            logger.warning(f"Nothing to summarize in {path.name}")
+            return False
+        sentences = re.split(r"(?<=[.!?])\s+", " ".join(text.split()))
+        summary = " ".join(sentences[:SUMMARY_SENTENCES])
+        dest = self.vault_path / "Needs_Action" / f"SUMMARY_{path.stem}.md"
+        header = format_frontmatter({"type": "summary", "source": target or path.name,
+                                     "words": len(text.split()), "status": "pending", "timestamp": time.ctime()})
+        dest.write_text(f"{header}# Summary: {target or path.name}\n{summary}\n", encoding='utf-8')
+        logger.info(f"Created summary {dest.name}")
+        self.counters.adjust(active_tasks=1)
+        self.update_dashboard_metric("Active Tasks", 1)
+        return True
 
     def handle_approval(self, path):
         logger.info(f"Executing Approved Action: {path.name}")
         # Simulation: After approval, move to Done
-        # In Gold tier, this is where you'd call an MCP server/script
-        time.sleep(2) 
+        # In Gold tier, this is where you'd call an MCP server/script.
+        # Files only get here once the readiness detector saw their write complete.
         dest = self.vault_path / "Done" / path.name
         try:
             shutil.move(str(path), str(dest))
+            self.counters.adjust(completed_tasks=1)
             logger.info(f"Moved approved task {path.name} to Done.")
         except Exception as e:
             logger.error(f"Error moving approved task: {e}")
@@ -148,6 +319,7 @@ class GlobalEventHandler(FileSystemEventHandler):
         archive.mkdir(parents=True, exist_ok=True)
         try:
             shutil.move(str(path), str(archive / path.name))
+            self.counters.adjust(rejected_tasks=1)
         except Exception as e:
             logger.error(f"Error moving rejected task: {e}")
 
@@ -156,32 +328,8 @@ class GlobalEventHandler(FileSystemEventHandler):
         self.update_dashboard_metric("Active Tasks", -1)
 
     def update_dashboard_metric(self, metric_name, delta):
-        try:
-            if not self.dashboard_path.exists():
-                logger.error(f"Dashboard not found at {self.dashboard_path}")
-                return
-            content = self.dashboard_path.read_text(encoding='utf-8')
-            lines = content.splitlines()
-            new_lines = []
-            updated = False
-            for line in lines:
-                if f"**{metric_name}**" in line:
-                    parts = line.split("|")
-                    if len(parts) >= 4:
-                        try:
-                            value_str = parts[3].strip()
-                            current_val = int(''.join(filter(str.isdigit, value_str)) or 0)
-                            new_val = max(0, current_val + delta)
-                            parts[3] = f" {new_val} in `/Needs_Action` "
-                            line = "|".join(parts)
-                            updated = True
-                        except Exception as e:
-                            logger.error(f"Failed to parse metric value: {e}")
-                new_lines.append(line)
-            if updated:
-                self.dashboard_path.write_text("\n".join(new_lines), encoding='utf-8')
-        except Exception as e:
-            logger.error(f"Error updating dashboard: {e}")
+        # Coalesced by the dashboard writer; safe to call from any worker
+        self.dashboard.add(metric_name, delta)
 
 if __name__ == "__main__":
     vault = VAULT_ROOT
@@ -197,10 +345,22 @@ if __name__ == "__main__":
         logger.info(f"Monitoring folder: {f_path}")
 
     observer.start()
+    # After start, so nothing dropped during the scan is missed
+    event_handler.catch_up()
+    event_handler.blobs.gc()
+    last_gc = time.monotonic()
     logger.info("Orchestrator started. Press Ctrl+C to stop.")
     try:
         while True:
             time.sleep(1)
+            # Tasks are deleted from outside (editor, dashboard), so sweep on a schedule
+            if time.monotonic() - last_gc >= BLOB_GC_INTERVAL:
+                try:
+                    event_handler.blobs.gc()
+                except Exception as e:
+                    logger.error(f"Blob gc failed: {e}")
+                last_gc = time.monotonic()
     except KeyboardInterrupt:
         observer.stop()
     observer.join()
+    event_handler.shutdown()
@@ -0,0 +1,322 @@
+"""
+Persistent outbound mail queue.
+Messages are written to Outbox/ as one JSON file each, named by a hash of
+recipient, subject and body, so queueing a send that is still pending, or
+that went out within the last dedupe_window seconds, is a no-op.
+A single sender thread drains the folder in batches under a token-bucket
+rate limit, retries transient failures with exponential backoff, and
+moves each message to Outbox/Sent or Outbox/Failed. Nothing is lost on a
+crash or restart: whatever is still in Outbox/ is sent on the next start.
+A message that is given up on is also reported to the on_failed callback,
+so the caller can put it in front of a person.
+
+Benchmark with the fake transport (no network):
+    python outbox.py --messages 2000 --rate 100 --batch 25
+"""
+
+import os
+import json
+import time
+import heapq
+import random
+import hashlib
+import logging
+import argparse
+import tempfile
+import threading
+from collections import namedtuple
+from pathlib import Path
+
+logger = logging.getLogger("Outbox")
+
+# Gmail answers these with "try again later"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+# An identical message sent this recently is treated as a repeat of the same request
+DEDUPE_WINDOW = 600
+
+# enqueue() result: queued is False when an identical message was already pending or just sent
+Enqueued = namedtuple("Enqueued", ["key", "queued"])
+
+
+def dedupe_key(to: str, subject: str, body: str):
+    raw = "\0".join((to.strip().lower(), subject, body)).encode("utf-8")
+    return hashlib.sha256(raw).hexdigest()[:24]
+
+
+def _write_json(path: Path, data: dict):
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+class TokenBucket:
+    """Allows `rate` operations per second on average, bursts up to `capacity`."""
+
+    def __init__(self, rate: float, capacity: float = None):
+        self.rate = rate
+        self.capacity = capacity or rate
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self, n: float = 1):
+        """Blocks until n tokens are available, then takes them."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= n:
+                    self._tokens -= n
+                    return
+                wait = (n - self._tokens) / self.rate
+            time.sleep(wait)
+
+
+class SendResult:
+    __slots__ = ("ok", "detail", "retryable")
+
+    def __init__(self, ok: bool, detail: str = "", retryable: bool = False):
+        self.ok = ok
+        self.detail = detail
+        self.retryable = retryable
+
+
+class GmailTransport:
+    """Sends batches through GmailService.send_messages (one batch HTTP request)."""
+
+    def __init__(self, gmail, lock: threading.Lock = None):
+        self.gmail = gmail
+        # googleapiclient is not thread-safe; share the caller's lock if it has one
+        self.lock = lock or threading.Lock()
+
+    def send_batch(self, messages):
+        try:
+            with self.lock:
+                responses = self.gmail.send_messages([(m["to"], m["subject"], m["body"]) for m in messages])
+        except Exception as e:
+            # No service, network down, whole batch rejected: try again later
+            return [SendResult(False, str(e), retryable=True) for _ in messages]
+
+        results = []
+        for response, error in responses:
+            if error is None:
+                results.append(SendResult(True, (response or {}).get("id", "")))
+            else:
+                status = getattr(getattr(error, "resp", None), "status", None)
+                results.append(SendResult(False, str(error), retryable=status is None or int(status) in RETRYABLE_STATUS))
+        return results
+
+
+class FakeTransport:
+    """Offline stand-in: fixed latency per batch and a random failure rate."""
+
+    def __init__(self, latency: float = 0.05, failure_rate: float = 0.0, seed: int = None):
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.random = random.Random(seed)
+        self.sent = 0
+        self.batches = 0
+
+    def send_batch(self, messages):
+        time.sleep(self.latency)
+        self.batches += 1
+        results = []
+        for _ in messages:
+            if self.random.random() < self.failure_rate:
+                results.append(SendResult(False, "503 backend error", retryable=True))
+            else:
+                self.sent += 1
+                results.append(SendResult(True, f"fake-{self.sent}"))
+        return results
+
+
+class Outbox:
+    """Folder-backed mail queue with one sender thread."""
+
+    def __init__(self, outbox_path: Path, transport, rate: float = 5.0, batch_size: int = 10,
+                 max_attempts: int = 6, base_delay: float = 2.0, max_delay: float = 600.0,
+                 dedupe_window: float = DEDUPE_WINDOW, on_failed=None):
+        self.path = Path(outbox_path)
+        self.sent_path = self.path / "Sent"
+        self.failed_path = self.path / "Failed"
+        for folder in (self.path, self.sent_path, self.failed_path):
+            folder.mkdir(parents=True, exist_ok=True)
+
+        self.transport = transport
+        self.bucket = TokenBucket(rate, capacity=max(rate, batch_size))
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.dedupe_window = dedupe_window
+        # on_failed(key, message) runs on the sender thread when a message is given up on
+        self.on_failed = on_failed
+
+        self._queue = []  # heap of (next_attempt, key)
+        self._cond = threading.Condition()
+        self._stopped = False
+        self._thread = None
+
+    def _recently_sent(self, name: str):
+        try:
+            return time.time() - (self.sent_path / name).stat().st_mtime < self.dedupe_window
+        except FileNotFoundError:
+            return False
+
+    def enqueue(self, to: str, subject: str, body: str, source: str = None):
+        """Queues a message; returns Enqueued(key, queued).
+
+        queued is False when an identical message is still pending or was
+        sent within dedupe_window seconds; it is not queued again then.
+        source names what asked for the send, for the failure report.
+        """
+        key = dedupe_key(to, subject, body)
+        name = f"{key}.json"
+        with self._cond:
+            if (self.path / name).exists() or self._recently_sent(name):
+                logger.info(f"Duplicate send to {to} ignored ({key})")
+                return Enqueued(key, False)
+            _write_json(self.path / name, {
+                "to": to, "subject": subject, "body": body, "source": source,
+                "attempts": 0, "next_attempt": 0, "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            })
+            heapq.heappush(self._queue, (0, key))
+            self._cond.notify()
+        logger.info(f"Queued mail to {to} ({key})")
+        return Enqueued(key, True)
+
+    def pending(self):
+        with self._cond:
+            return len(self._queue)
+
+    def start(self):
+        """Loads messages left from a previous run and starts the sender thread."""
+        with self._cond:
+            with os.scandir(self.path) as entries:
+                for entry in entries:
+                    if entry.is_file() and entry.name.endswith(".json") and not entry.name.startswith("."):
+                        message = self._load(entry.name[:-5])
+                        if message is not None:
+                            heapq.heappush(self._queue, (message.get("next_attempt", 0), entry.name[:-5]))
+        if self._queue:
+            logger.info(f"Outbox has {len(self._queue)} pending messages")
+        self._thread = threading.Thread(target=self._run, name="OutboxSender", daemon=True)
+        self._thread.start()
+
+    def stop(self, drain: bool = False, timeout: float = None):
+        """Stops the sender; with drain, first waits (up to timeout) for due messages to go out."""
+        if drain:
+            deadline = time.monotonic() + timeout if timeout else None
+            while self.pending() and (deadline is None or time.monotonic() < deadline):
+                time.sleep(0.05)
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+        if self._thread:
+            self._thread.join()
+
+    def _load(self, key: str):
+        try:
+            with open(self.path / f"{key}.json", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError) as e:
+            logger.error(f"Unreadable outbox message {key}: {e}")
+            return None
+
+    def _next_batch(self):
+        """Waits for due messages and pops up to batch_size of them; None when stopped."""
+        with self._cond:
+            while True:
+                if self._stopped:
+                    return None
+                now = time.time()
+                if self._queue and self._queue[0][0] <= now:
+                    break
+                self._cond.wait(self._queue[0][0] - now if self._queue else None)
+            keys = []
+            while self._queue and self._queue[0][0] <= now and len(keys) < self.batch_size:
+                keys.append(heapq.heappop(self._queue)[1])
+            return keys
+
+    def _run(self):
+        while True:
+            keys = self._next_batch()
+            if keys is None:
+                return
+            batch = [(key, message) for key, message in ((k, self._load(k)) for k in keys) if message]
+            if not batch:
+                continue
+            self.bucket.acquire(len(batch))
+            try:
+                results = self.transport.send_batch([message for _, message in batch])
+            except Exception as e:
+                results = [SendResult(False, str(e), retryable=True) for _ in batch]
+            for (key, message), result in zip(batch, results):
+                self._settle(key, message, result)
+
+    def _settle(self, key: str, message: dict, result: SendResult):
+        source = self.path / f"{key}.json"
+        message["attempts"] = message.get("attempts", 0) + 1
+        if result.ok:
+            message["sent"] = time.strftime("%Y-%m-%dT%H:%M:%S")
+            message["message_id"] = result.detail
+            _write_json(source, message)
+            os.replace(source, self.sent_path / source.name)
+            logger.info(f"Sent mail to {message['to']} ({key})")
+            return
+
+        message["last_error"] = result.detail
+        if not result.retryable or message["attempts"] >= self.max_attempts:
+            _write_json(source, message)
+            os.replace(source, self.failed_path / source.name)
+            logger.error(f"Giving up on mail to {message['to']} after {message['attempts']} attempts: {result.detail}")
+            if self.on_failed:
+                try:
+                    self.on_failed(key, message)
+                except Exception as e:
+                    logger.error(f"Failure handler for {key} failed: {e}")
+            return
+
+        # Exponential backoff with jitter so a recovering API is not hit all at once
+        delay = min(self.max_delay, self.base_delay * 2 ** (message["attempts"] - 1))
+        message["next_attempt"] = time.time() + delay * random.uniform(0.5, 1.0)
+        _write_json(source, message)
+        with self._cond:
+            heapq.heappush(self._queue, (message["next_attempt"], key))
+        logger.warning(f"Send to {message['to']} failed (attempt {message['attempts']}), retrying in {delay:.0f}s: {result.detail}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--rate", type=float, default=100, help="Sends per second allowed by the token bucket")
+    parser.add_argument("--batch", type=int, default=25)
+    parser.add_argument("--latency", type=float, default=0.05, help="Fake API latency per batch (s)")
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        transport = FakeTransport(latency=args.latency, failure_rate=args.failure_rate, seed=1)
+        outbox = Outbox(Path(tmp) / "Outbox", transport, rate=args.rate, batch_size=args.batch, base_delay=0.1)
+        outbox.start()
+        start = time.perf_counter()
+        for i in range(args.messages):
+            outbox.enqueue(f"user{i}@example.com", "Benchmark", f"Message {i}")
+        # Identical sends are dropped at enqueue time
+        for i in range(min(100, args.messages)):
+            outbox.enqueue(f"user{i}@example.com", "Benchmark", f"Message {i}")
+        outbox.stop(drain=True)
+        elapsed = time.perf_counter() - start
+
+        sent = len(os.listdir(outbox.sent_path))
+        failed = len(os.listdir(outbox.failed_path))
+        print(f"{sent} sent, {failed} failed in {elapsed:.2f}s "
+              f"({sent / elapsed:.1f} msg/s, {transport.batches} API batches, limit {args.rate}/s)")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,113 @@
+"""
+Memory-bounded reading of files dropped into the vault.
+The encoding is guessed once from a small sample, and the text is then
+streamed in decoded chunks, so a file is never held in memory whole.
+Files above max_bytes are only sampled: their head plus a few slices
+spread over the rest of the file.
+"""
+
+import os
+import codecs
+from pathlib import Path
+
+SAMPLE_BYTES = 64 * 1024
+CHUNK_BYTES = 256 * 1024
+PREVIEW_CHARS = 4096
+
+# Above this size only the head and some samples are analyzed; override with INBOX_MAX_ANALYZED_MB
+MAX_ANALYZED_BYTES = int(float(os.environ.get("INBOX_MAX_ANALYZED_MB", 16)) * 1024 * 1024)
+HEAD_BYTES = 1024 * 1024
+SAMPLE_COUNT = 8
+
+BOMS = [
+    (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16-le"),
+    (codecs.BOM_UTF16_BE, "utf-16-be"),
+]
+
+
+def detect_encoding(sample: bytes):
+    """Best guess among utf-8, cp1252 and latin-1 from the first bytes; None for binary data."""
+    for bom, encoding in BOMS:
+        if sample.startswith(bom):
+            return encoding
+    if b"\x00" in sample:
+        return None
+    try:
+        # Not final: the sample may end in the middle of a multi-byte character
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+        return "utf-8"
+    except UnicodeDecodeError:
+        pass
+    try:
+        sample.decode("cp1252")
+        return "cp1252"
+    except UnicodeDecodeError:
+        # latin-1 decodes any byte sequence
+        return "latin-1"
+
+
+class TextFile:
+    """Encoding, size and streamed text of a file; cheap to create."""
+
+    def __init__(self, path: Path, max_bytes: int = MAX_ANALYZED_BYTES):
+        self.path = Path(path)
+        self.size = self.path.stat().st_size
+        self.max_bytes = max_bytes
+        with open(self.path, "rb") as f:
+            sample = f.read(SAMPLE_BYTES)
+        self.encoding = detect_encoding(sample)
+        self.binary = self.encoding is None
+        self.truncated = self.size > max_bytes
+        self.preview = self._decode(sample)[:PREVIEW_CHARS].lstrip("\ufeff") if not self.binary else ""
+
+    def _decode(self, data: bytes):
+        return codecs.getincrementaldecoder(self.encoding)(errors="replace").decode(data, final=False)
+
+    def _ranges(self):
+        """(offset, length) byte ranges to read: everything, or head plus samples when too large."""
+        if not self.truncated:
+            return [(0, self.size)]
+        ranges = [(0, HEAD_BYTES)]
+        stride = (self.size - HEAD_BYTES) // SAMPLE_COUNT
+        for i in range(SAMPLE_COUNT):
+            offset = HEAD_BYTES + i * stride
+            if self.encoding.startswith("utf-16"):
+                offset -= offset % 2  # Stay on a code unit boundary
+            ranges.append((offset, SAMPLE_BYTES))
+        return ranges
+
+    def chunks(self, chunk_bytes: int = CHUNK_BYTES):
+        """Decoded text in chunks of about chunk_bytes; bounded by max_bytes overall."""
+        if self.binary:
+            return
+        with open(self.path, "rb") as f:
+            for offset, length in self._ranges():
+                f.seek(offset)
+                # Each range gets its own decoder; a sample may start mid-character
+                decoder = codecs.getincrementaldecoder(self.encoding)(errors="replace")
+                remaining = length
+                while remaining > 0:
+                    data = f.read(min(chunk_bytes, remaining))
+                    if not data:
+                        break
+                    remaining -= len(data)
+                    text = decoder.decode(data)
+                    if offset == 0 and remaining + len(data) == length:
+                        text = text.lstrip("\ufeff")  # Byte order mark
+                    if text:
+                        yield text
+                tail = decoder.decode(b"", final=True)
+                if tail:
+                    yield tail
+
+    def head(self, max_chars: int):
+        """Up to max_chars of text from the start of the file."""
+        parts = []
+        count = 0
+        for text in self.chunks():
+            parts.append(text[:max_chars - count])
+            count += len(parts[-1])
+            if count >= max_chars:
+                break
+        return "".join(parts)
@@ -0,0 +1,109 @@
+"""
+Persisted vault counters (active, completed, rejected tasks and revenue).
+Kept in a small SQLite database under Logs so the orchestrator and the web
+dashboard can both update them atomically from their move operations.
+"""
+
+import os
+import re
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+
+logger = logging.getLogger("VaultCounters")
+
+COUNTERS = ("active_tasks", "completed_tasks", "rejected_tasks", "revenue_cents")
+
+REVENUE_PATTERN = re.compile(r"\*\*Weekly Revenue\*\*\s*\|\s*🟢 Healthy\s*\|\s*(\$[0-9,.]+)")
+
+
+def parse_revenue(dashboard_path: Path):
+    """Weekly revenue from Dashboard.md in cents, or 0 if not found."""
+    if not dashboard_path.exists():
+        return 0
+    match = REVENUE_PATTERN.search(dashboard_path.read_text(encoding="utf-8"))
+    if not match:
+        return 0
+    try:
+        return round(float(match.group(1).lstrip("$").replace(",", "")) * 100)
+    except ValueError:
+        return 0
+
+
+def format_revenue(cents: int):
+    return f"${cents / 100:,.2f}"
+
+
+def _count_entries(folder: Path, pattern: str = None):
+    if not folder.exists():
+        return 0
+    with os.scandir(folder) as entries:
+        if pattern:
+            return sum(1 for e in entries if Path(e.name).match(pattern))
+        return sum(1 for _ in entries)
+
+
+class VaultCounters:
+    def __init__(self, vault_path: Path, db_path: Path = None):
+        self.vault_path = Path(vault_path)
+        self.db_path = db_path or self.vault_path / "Logs" / "vault_state.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        with self._connect() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS counters (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.executemany("INSERT OR IGNORE INTO counters (name, value) VALUES (?, 0)", [(n,) for n in COUNTERS])
+
+    def _connect(self):
+        # sqlite3 connections are not shareable across threads; keep one per thread
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def adjust(self, **deltas):
+        """Atomically add deltas, e.g. adjust(active_tasks=-1, completed_tasks=2)."""
+        deltas = {k: v for k, v in deltas.items() if v}
+        if not deltas:
+            return
+        try:
+            with self._connect() as conn:
+                conn.executemany(
+                    "UPDATE counters SET value = MAX(0, value + ?) WHERE name = ?",
+                    [(delta, name) for name, delta in deltas.items()]
+                )
+        except sqlite3.Error as e:
+            logger.error(f"Failed to update counters {deltas}: {e}")
+
+    def set(self, **values):
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE counters SET value = ? WHERE name = ?",
+                [(value, name) for name, value in values.items()]
+            )
+
+    def get_all(self):
+        rows = self._connect().execute("SELECT name, value FROM counters").fetchall()
+        return dict(rows)
+
+    def scan(self):
+        """Full recount from the folders; only used to check the counters."""
+        return {
+            "active_tasks": _count_entries(self.vault_path / "Needs_Action", "*.md"),
+            "completed_tasks": _count_entries(self.vault_path / "Done"),
+            "rejected_tasks": _count_entries(self.vault_path / "Logs" / "Archive" / "Rejected"),
+            "revenue_cents": parse_revenue(self.vault_path / "Dashboard.md"),
+        }
+
+    def reconcile(self):
+        """Checks the persisted counters against a full scan and repairs any drift."""
+        actual = self.scan()
+        stored = self.get_all()
+        drift = {name: (stored.get(name), value) for name, value in actual.items() if stored.get(name) != value}
+        if drift:
+            for name, (old, new) in drift.items():
+                logger.warning(f"Counter {name} drifted: stored {old}, actual {new}. Repairing.")
+            self.set(**actual)
+        return actual
@@ -0,0 +1,89 @@
+"""
+Shared reader/writer for vault markdown documents with a '---' header.
+Listing views only need the header and the first lines of the body, so
+read_header reads a bounded prefix of the file and memoizes the result
+on (path, mtime_ns, size); a changed file gets a new key automatically.
+"""
+
+import os
+import codecs
+from functools import lru_cache
+from pathlib import Path
+
+HEADER_PREFIX_BYTES = 8192
+HEADER_CACHE_SIZE = 4096
+
+
+def split_document(text: str):
+    """Splits text into (fields, body). Documents without a header have no fields."""
+    fields = {}
+    lines = text.splitlines(keepends=True)
+    if not lines or not lines[0].startswith("---"):
+        return fields, text
+
+    offset = len(lines[0])
+    for line in lines[1:]:
+        offset += len(line)
+        if line.startswith("---"):
+            return fields, text[offset:]
+        key, sep, value = line.partition(":")
+        if sep and key.strip() and key.strip() not in fields:
+            fields[key.strip()] = value.strip()
+    # Unterminated header: everything was header
+    return fields, ""
+
+
+def summarize_body(body: str):
+    """(title, first_line): the first '# ' heading and the first non-heading text line."""
+    title = None
+    first_line = ""
+    for line in body.splitlines():
+        stripped = line.strip()
+        if not stripped:
+            continue
+        if stripped.startswith("# ") and title is None:
+            title = stripped[2:].strip()
+        elif not stripped.startswith("#") and not first_line:
+            first_line = stripped
+        if title is not None and first_line:
+            break
+    return title, first_line
+
+
+@lru_cache(maxsize=HEADER_CACHE_SIZE)
+def _read_header(path: str, mtime_ns: int, size: int):
+    # mtime_ns and size only take part in the cache key
+    with open(path, "rb") as f:
+        prefix = f.read(HEADER_PREFIX_BYTES)
+    # Incremental decoding drops a multi-byte character cut off at the boundary
+    text = codecs.getincrementaldecoder("utf-8")(errors="replace").decode(prefix, final=size <= HEADER_PREFIX_BYTES)
+    fields, body = split_document(text)
+    title, first_line = summarize_body(body)
+    return {"fields": fields, "title": title, "first_line": first_line}
+
+
+def read_header(path: Path, stat=None):
+    """Header fields, title and first body line of path, read from a bounded prefix.
+
+    Returns a dict shared with the cache; callers must not modify it.
+    """
+    stat = stat or os.stat(path)
+    return _read_header(str(path), stat.st_mtime_ns, stat.st_size)
+
+
+def format_frontmatter(fields: dict):
+    """Renders fields as a '---' header block, in the given order."""
+    # Values are kept on one line so they cannot break out of the header
+    lines = [f"{key}: {' '.join(str(value).splitlines())}" for key, value in fields.items()]
+    return "---\n" + "\n".join(lines) + "\n---\n"
+
+
+def write_document(path: Path, text: str):
+    """Writes text to path via a temp file and os.replace.
+
+    Replacing the directory entry, rather than writing into the existing
+    file, never changes data shared through a hard link.
+    """
+    tmp_path = path.with_name(f".{path.name}.tmp")
+    tmp_path.write_text(text, encoding="utf-8")
+    os.replace(tmp_path, path)
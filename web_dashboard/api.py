@@ -1,12 +1,114 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from fastapi.staticfiles import StaticFiles
+from contextlib import asynccontextmanager
+from email.utils import formatdate, parsedate_to_datetime
+from functools import partial
 from pathlib import Path
+from watchdog.observers import Observer
+from pydantic import BaseModel, Field
+from datetime import datetime
+import anyio
+import asyncio
 import os
+import sys
 import json
+import hashlib
+import logging
 import re
+import shutil
+import sqlite3
+import threading
+
+APP_ROOT = Path(__file__).parent.parent.resolve()
+VAULT_ROOT = Path(os.environ.get("VAULT_ROOT", APP_ROOT)).resolve()
+
+# Vault modules shared with the watchers live in watchers/
+sys.path.insert(0, str(APP_ROOT / "watchers"))
+
+from vault_counters import VaultCounters, COUNTERS, parse_revenue, format_revenue
+from vault_document import split_document
+from task_index import TaskIndex, InvalidCursor, TASK_TYPES, PRIORITIES, SORT_KEYS
+from events import EventBroker, LogFollower, FileWatch
+from search_index import SearchIndex
+from commands import CommandRouter
+from message_store import MessageStore
+from log_tail import resolve_log, level_matcher, tail_lines, follow_lines, LEVELS
+
+logger = logging.getLogger("DashboardAPI")
+
+task_index = TaskIndex(VAULT_ROOT / "Needs_Action")
+broker = EventBroker()
+counters = VaultCounters(VAULT_ROOT)
+search_index = SearchIndex(VAULT_ROOT, ["Needs_Action", "Done", "Logs/Archive/Rejected"])
+command_router = CommandRouter()
+message_store = MessageStore(VAULT_ROOT)
+dashboard_state = {"last_updated": 0}
+# Last values read from the counters database; /api/stats answers from here
+counter_values = dict.fromkeys(COUNTERS, 0)
+
+# All vault disk access from request handlers goes through this bounded
+# pool, so a slow or network-mounted vault ties up these threads rather
+# than the event loop.
+IO_LIMITER = anyio.CapacityLimiter(int(os.environ.get("VAULT_IO_THREADS", 8)))
+
+async def run_io(func, *args, **kwargs):
+    return await anyio.to_thread.run_sync(partial(func, *args, **kwargs), limiter=IO_LIMITER)
 
-app = FastAPI()
+def on_task_change(event, data, version):
+    # The dashboard renders only the first page, so it takes list totals from here rather than counting
+    broker.publish(event, {**data, "version": version, "totals": task_index.type_totals()})
+    broker.publish("stats-changed", compute_stats())
+
+task_index.add_listener(on_task_change)
+
+def publish_stats():
+    broker.publish("stats-changed", compute_stats())
+
+def refresh_counters():
+    """The counters database changed (here or in the orchestrator): re-read it once, off the request path."""
+    counter_values.update(counters.get_all())
+    publish_stats()
+
+def on_dashboard_change():
+    """Dashboard.md was edited: pick up the revenue figure once, off the request path."""
+    dashboard_path = VAULT_ROOT / "Dashboard.md"
+    counters.set(revenue_cents=parse_revenue(dashboard_path))
+    dashboard_state["last_updated"] = os.path.getmtime(dashboard_path) if dashboard_path.exists() else 0
+    refresh_counters()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    broker.bind(asyncio.get_running_loop())
+    logs_path = VAULT_ROOT / "Logs"
+    logs_path.mkdir(parents=True, exist_ok=True)
+    done_path = VAULT_ROOT / "Done"
+    done_path.mkdir(parents=True, exist_ok=True)
+
+    # Check the persisted counters against a full scan once, at startup
+    counter_values.update(await run_io(counters.reconcile))
+    dashboard_path = VAULT_ROOT / "Dashboard.md"
+    dashboard_state["last_updated"] = os.path.getmtime(dashboard_path) if dashboard_path.exists() else 0
+
+    observer = Observer()
+    await run_io(task_index.schedule, observer)
+    observer.schedule(FileWatch(on_dashboard_change, names=["Dashboard.md"]), str(VAULT_ROOT), recursive=False)
+    observer.schedule(FileWatch(publish_stats), str(done_path), recursive=False)
+    # WAL mode: committed writes land in the -wal file until a checkpoint
+    observer.schedule(FileWatch(refresh_counters, names=[counters.db_path.name, f"{counters.db_path.name}-wal"]),
+                      str(counters.db_path.parent), recursive=False)
+    search_index.schedule(observer)
+    observer.schedule(LogFollower(logs_path / "orchestrator.log", broker), str(logs_path), recursive=False)
+    observer.start()
+    # Catch up on files that changed while the API was down, without delaying startup
+    threading.Thread(target=search_index.reconcile, name="SearchReconcile", daemon=True).start()
+    yield
+    observer.stop()
+    observer.join()
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS for frontend development
 app.add_middleware(
@@ -16,76 +118,211 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-VAULT_ROOT = Path(__file__).parent.parent.resolve()
+# Compress the larger JSON responses. Brotli is used when brotli-asgi is
+# installed; event streams are excluded by both middlewares.
+try:
+    from brotli_asgi import BrotliMiddleware
+    app.add_middleware(BrotliMiddleware, minimum_size=1024, gzip_fallback=True)
+except ImportError:
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
+
+def query_tag(request: Request):
+    """Short digest of the query string, so each filtered view gets its own ETag."""
+    query = "&".join(sorted(f"{k}={v}" for k, v in request.query_params.multi_items()))
+    return hashlib.sha1(query.encode("utf-8")).hexdigest()[:12]
+
+def stat_tag(stat):
+    return f"{stat.st_mtime_ns:x}-{stat.st_size:x}"
+
+def is_not_modified(request: Request, etag: str, last_modified: float = None):
+    """Evaluates If-None-Match, falling back to If-Modified-Since."""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match:
+        tags = [t.strip() for t in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified is not None:
+        try:
+            return int(last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+async def conditional_json(request: Request, etag: str, build, last_modified: float = None, blocking: bool = False):
+    """Returns 304 if the client already holds etag, otherwise build() as JSON.
+
+    Set blocking when build touches the disk; it then runs in the I/O pool.
+    """
+    etag = f'"{etag}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if last_modified is not None:
+        headers["Last-Modified"] = formatdate(last_modified, usegmt=True)
+    if is_not_modified(request, etag, last_modified):
+        return Response(status_code=304, headers=headers)
+    body = await run_io(build) if blocking else build()
+    return JSONResponse(body, headers=headers)
 
 @app.get("/api/ping")
 async def ping():
     return {"status": "pong", "version": "1.1"}
 
 @app.get("/api/stats")
-async def get_stats():
+async def get_stats(request: Request):
     """Returns core metrics from the vault."""
-    dashboard_path = VAULT_ROOT / "Dashboard.md"
-    needs_action_path = VAULT_ROOT / "Needs_Action"
-    done_path = VAULT_ROOT / "Done"
-    logs_path = VAULT_ROOT / "Logs"
-    
-    # Count active tasks
-    active_tasks = len(list(needs_action_path.glob("*.md"))) if needs_action_path.exists() else 0
-    done_tasks = len(list(done_path.glob("*"))) if done_path.exists() else 0
-    
-    # Parse revenue from Dashboard.md (simple regex)
-    revenue = "$0.00"
-    if dashboard_path.exists():
-        content = dashboard_path.read_text(encoding="utf-8")
-        revenue_match = re.search(r"\*\*Weekly Revenue\*\*\s*\|\s*🟢 Healthy\s*\|\s*(\$[0-9,.]+)", content)
-        if revenue_match:
-            revenue = revenue_match.group(1)
-            
+    stats = compute_stats()
+    etag = hashlib.sha1(json.dumps(stats, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+    return await conditional_json(request, f"stats-{etag}", lambda: stats)
+
+def compute_stats():
+    # Active tasks come from the in-memory index, the rest from the cached counters
+    values = counter_values
     return {
-        "active_tasks": active_tasks,
-        "completed_tasks": done_tasks,
-        "revenue": revenue,
+        "active_tasks": task_index.count(),
+        "completed_tasks": values["completed_tasks"],
+        "rejected_tasks": values["rejected_tasks"],
+        "revenue": format_revenue(values["revenue_cents"]),
         "system_health": "Online",
-        "last_updated": os.path.getmtime(dashboard_path) if dashboard_path.exists() else 0
+        "last_updated": dashboard_state["last_updated"]
     }
 
+def split_param(value):
+    return [v.strip() for v in value.split(",") if v.strip()] if value else None
+
 @app.get("/api/tasks")
-async def get_tasks():
-    """Returns the list of pending tasks with snippets."""
-    needs_action_path = VAULT_ROOT / "Needs_Action"
-    if not needs_action_path.exists():
-        return []
-    
-    tasks = []
-    for file in needs_action_path.glob("*.md"):
+async def get_tasks(
+    request: Request,
+    limit: int = Query(50, ge=1, le=500),
+    cursor: str = None,
+    task_type: str = Query(None, alias="type"),
+    priority: str = None,
+    sort: str = "-time",
+    since: int = None,
+):
+    """Returns one page of pending tasks with snippets.
+
+    type and priority take comma-separated values; sort is time, title or
+    priority, prefixed with '-' for descending. Pass next_cursor back as
+    cursor to get the following page.
+
+    With since=<version>, returns only the tasks changed and the ids removed
+    after that version, with the task count per type, instead of a page, or
+    reset=true if the client is too far behind and must reload.
+    """
+    # The index version changes with every task change, so it is a strong validator
+    version = task_index.version
+    etag = f"tasks-{version:x}-{query_tag(request)}"
+    if is_not_modified(request, f'"{etag}"'):
+        return await conditional_json(request, etag, None)
+
+    if since is not None:
+        delta = task_index.changes_since(since)
+        if delta is None:
+            return await conditional_json(request, etag, lambda: {"reset": True, "version": version})
+        changed, removed, delta_version = delta
+        return await conditional_json(request, etag, lambda: {"changed": changed, "removed": removed, "version": delta_version,
+                                                              "totals": task_index.type_totals()})
+
+    types = split_param(task_type)
+    priorities = split_param(priority)
+    if types and not set(types) <= set(TASK_TYPES):
+        raise HTTPException(status_code=400, detail=f"type must be one of {', '.join(TASK_TYPES)}")
+    if priorities and not set(priorities) <= set(PRIORITIES):
+        raise HTTPException(status_code=400, detail=f"priority must be one of {', '.join(PRIORITIES)}")
+
+    descending = sort.startswith("-")
+    sort_key = sort.lstrip("-")
+    if sort_key not in SORT_KEYS:
+        raise HTTPException(status_code=400, detail=f"sort must be one of {', '.join(SORT_KEYS)}")
+
+    try:
+        items, next_cursor = task_index.page(limit, cursor, sort_key, descending, types, priorities)
+    except InvalidCursor as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return await conditional_json(request, etag, lambda: {
+        "items": items,
+        "next_cursor": next_cursor,
+        "total": task_index.total(types, priorities),
+        "version": version
+    })
+
+@app.get("/api/events")
+async def stream_events(request: Request):
+    """Server-sent events: task-added, task-changed, task-removed, stats-changed and log-line."""
+    queue = broker.subscribe()
+
+    async def event_stream():
         try:
-            content = file.read_text(encoding="utf-8")
-            # Extract title or snippet
-            lines = content.splitlines()
-            title = file.name
-            snippet = ""
-            sender = ""
-            for line in lines:
-                if line.startswith("# "):
-                    title = line[2:].strip()
-                elif line.startswith("from:"):
-                    sender = line[5:].strip()
-                elif not line.startswith("---") and line.strip() and not snippet:
-                    snippet = line.strip()[:100]
-            
-            tasks.append({
-                "id": file.name,
-                "title": title,
-                "snippet": snippet,
-                "sender": sender,
-                "time": os.path.getmtime(file),
-                "type": "email" if "EMAIL" in file.name else "file"
-            })
-        except Exception:
+            while not await request.is_disconnected():
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), timeout=15)
+                except asyncio.TimeoutError:
+                    # Keep proxies from closing an idle stream
+                    yield ": keepalive\n\n"
+                    continue
+                yield f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        finally:
+            broker.unsubscribe(queue)
+
+    return StreamingResponse(event_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+def complete_tasks(task_ids):
+    """Moves each task and its related files from Needs_Action to Done.
+
+    Related files come from the task index instead of a directory glob, and
+    each file is moved with os.replace, an atomic rename on the same
+    filesystem. Runs in the I/O pool; returns one result per id.
+    """
+    needs_action_path = VAULT_ROOT / "Needs_Action"
+    done_path = VAULT_ROOT / "Done"
+    done_path.mkdir(parents=True, exist_ok=True)
+
+    results = []
+    active_delta = 0
+    completed_delta = 0
+    for task_id in task_ids:
+        src_main = needs_action_path / task_id
+        if Path(task_id).name != task_id or not src_main.exists():
+            results.append({"id": task_id, "status": "not_found", "detail": f"Task {task_id} not found"})
             continue
-    
-    return sorted(tasks, key=lambda x: x["time"], reverse=True)
+
+        related = task_index.related_files(task_id) | {task_id}
+        try:
+            for name in sorted(related):
+                dest = done_path / name
+                replaced = dest.exists()
+                if dest.is_dir():
+                    shutil.rmtree(dest)
+                try:
+                    os.replace(needs_action_path / name, dest)
+                except FileNotFoundError:
+                    # Already moved by someone else since the index saw it
+                    continue
+                if name.endswith(".md"):
+                    active_delta += 1
+                if not replaced:
+                    completed_delta += 1
+            results.append({"id": task_id, "status": "success"})
+        except OSError as e:
+            logger.error(f"Failed to complete task {task_id}: {e}")
+            results.append({"id": task_id, "status": "error", "detail": str(e)})
+
+    counters.adjust(active_tasks=-active_delta, completed_tasks=completed_delta)
+    return results
+
+class CompleteRequest(BaseModel):
+    ids: list[str] = Field(min_length=1, max_length=1000)
+
+@app.post("/api/tasks/complete")
+async def complete_tasks_bulk(request: CompleteRequest):
+    """Completes many tasks in one call and reports success or failure per id."""
+    # Drop duplicates but keep the caller's order
+    results = await run_io(complete_tasks, list(dict.fromkeys(request.ids)))
+    return {
+        "results": results,
+        "completed": sum(1 for r in results if r["status"] == "success"),
+        "failed": sum(1 for r in results if r["status"] != "success")
+    }
 
 @app.post("/api/task/complete")
 async def complete_task(data: dict):
@@ -94,79 +331,214 @@ async def complete_task(data: dict):
     if not task_id:
         raise HTTPException(status_code=400, detail="Missing task ID")
     
-    needs_action_path = VAULT_ROOT / "Needs_Action"
-    done_path = VAULT_ROOT / "Done"
-    done_path.mkdir(parents=True, exist_ok=True)
-    
-    src_main = needs_action_path / task_id
-    if not src_main.exists():
-        raise HTTPException(status_code=404, detail=f"Task {task_id} not found")
-    
-    import shutil
+    result = (await run_io(complete_tasks, [task_id]))[0]
+    if result["status"] == "not_found":
+        raise HTTPException(status_code=404, detail=result["detail"])
+    if result["status"] == "error":
+        raise HTTPException(status_code=500, detail=result["detail"])
+    return {"status": "success"}
+
+@app.get("/api/search")
+async def search(q: str = Query(..., min_length=1), limit: int = Query(20, ge=1, le=200)):
+    """Full-text search over Needs_Action, Done and rejected tasks.
+
+    Plain terms are prefix-matched anywhere; from:, subject:, type:,
+    priority:, folder: and name: restrict a term to that field. Quote
+    phrases, e.g. from:alice "due date".
+    """
     try:
-        base_name = src_main.stem
-        related_files = list(needs_action_path.glob(f"{base_name}.*"))
-        
-        for file_path in related_files:
-            dest = done_path / file_path.name
-            if dest.exists():
-                if dest.is_dir(): shutil.rmtree(dest)
-                else: dest.unlink()
-            shutil.move(str(file_path), str(dest))
-            
-        return {"status": "success"}
-    except Exception as e:
-        import logging
-        logging.error(f"Failed to complete task {task_id}: {e}")
-        raise HTTPException(status_code=500, detail=str(e))
+        return await run_io(search_index.search, q, limit)
+    except sqlite3.OperationalError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid query: {e}")
 
-@app.get("/api/task/{task_id}")
-async def get_task_detail(task_id: str):
-    """Returns the parsed content of a specific task."""
-    task_path = VAULT_ROOT / "Needs_Action" / task_id
-    if not task_path.exists():
-        raise HTTPException(status_code=404, detail="Task not found")
-    
-    content = task_path.read_text(encoding="utf-8")
-    
+def parse_task_detail(task_id: str, content: str):
     # Parse markdown headers if it's an email
     result = {"content": content, "from": "Unknown", "subject": "No Subject", "body": content}
     
     if task_id.startswith("EMAIL_") or content.startswith("---"):
-        lines = content.splitlines()
-        body_start = 0
-        in_header = False
-        for i, line in enumerate(lines):
-            if line.startswith("---"):
-                if not in_header: in_header = True
-                else: 
-                    body_start = i + 1
-                    break
-            elif in_header:
-                if line.startswith("from:"): 
-                    raw_from = line[5:].strip()
-                    # Try to extract email from "Name <email@..."
-                    email_match = re.search(r'<(.+?)>', raw_from)
-                    result["from"] = email_match.group(1) if email_match else raw_from
-                elif line.startswith("subject:"): result["subject"] = line[8:].strip()
+        fields, body = split_document(content)
+        if "from" in fields:
+            raw_from = fields["from"]
+            # Try to extract email from "Name <email@..."
+            email_match = re.search(r'<(.+?)>', raw_from)
+            result["from"] = email_match.group(1) if email_match else raw_from
+        if "subject" in fields:
+            result["subject"] = fields["subject"]
         
         # Strip ## Email Content etc
-        result["body"] = "\n".join(lines[body_start:]).replace("## Email Content", "").replace("## Suggested Actions", "").strip()
+        result["body"] = body.replace("## Email Content", "").replace("## Suggested Actions", "").strip()
     
     return result
 
-@app.get("/api/logs")
-async def get_logs():
-    """Returns recent orchestrator logs."""
-    log_file = VAULT_ROOT / "Logs" / "orchestrator.log"
-    if not log_file.exists():
+# Gmail client for fetching email bodies on demand; created on first use
+gmail_state = {"service": None, "lock": threading.Lock()}
+
+# Attachment downloads can be large: they get their own small pool, apart from vault I/O
+ATTACHMENT_LIMITER = anyio.CapacityLimiter(int(os.environ.get("ATTACHMENT_THREADS", 2)))
+attachment_locks = {}
+attachment_locks_guard = threading.Lock()
+
+def email_message_id(task_id: str):
+    """The Gmail message id of an EMAIL_<id>.md task, else None."""
+    match = re.fullmatch(r"EMAIL_([0-9A-Za-z]+)\.md", task_id)
+    return match.group(1) if match else None
+
+def gmail_client():
+    with gmail_state["lock"]:
+        if gmail_state["service"] is None:
+            from gmail_service import GmailService
+            watchers_dir = APP_ROOT / "watchers"
+            gmail_state["service"] = GmailService(
+                str(watchers_dir / "gmail_credentials.json"), str(watchers_dir / "gmail_token.json"))
+        return gmail_state["service"]
+
+def fetch_email_body(msg_id: str):
+    """The full body of a message: from the message store, or fetched once from Gmail.
+
+    Only the message itself is downloaded; attachments are listed and
+    fetched when asked for (see get_attachment).
+    """
+    body = message_store.body(msg_id)
+    if body is not None:
+        return body
+    try:
+        gmail = gmail_client()
+        # googleapiclient is not thread-safe; one fetch at a time
+        with gmail_state["lock"]:
+            body = message_store.body(msg_id)
+            if body is not None:
+                return body
+            message = gmail.get_message_content(msg_id)
+    except Exception as e:
+        logger.error(f"Could not fetch email {msg_id}: {e}")
+        return None
+    if message is None:
+        return None
+    message_store.set_body(msg_id, message["body"], message["attachments"])
+    return message["body"]
+
+def attachments_folder(msg_id: str):
+    return VAULT_ROOT / "Attachments" / msg_id
+
+def list_email_attachments(msg_id: str):
+    attachments = message_store.attachments(msg_id)
+    if not attachments:
         return []
+    from gmail_service import attachment_filenames
+    return [{"index": i, "filename": name, "size": a.get("size", 0), "mime_type": a.get("mime_type")}
+            for i, (a, name) in enumerate(zip(attachments, attachment_filenames(attachments)))]
+
+def build_task_detail(task_id: str, task_path: Path):
+    result = parse_task_detail(task_id, task_path.read_text(encoding="utf-8"))
+    msg_id = email_message_id(task_id)
+    if msg_id:
+        body = fetch_email_body(msg_id)
+        if body:
+            result["body"] = body
+        result["attachments"] = list_email_attachments(msg_id)
+    return result
+
+def download_attachment(msg_id: str, attachment: dict, name: str):
+    """Saves one attachment under Attachments/<id>/ unless it is already there; returns its path."""
+    folder = attachments_folder(msg_id)
+    path = folder / name
+    with attachment_locks_guard:
+        lock = attachment_locks.setdefault(str(path), threading.Lock())
+    # Two requests for the same file download it once; different files download in parallel
+    with lock:
+        if not path.exists():
+            gmail = gmail_client()
+            if gmail.creds:
+                # Streamed over its own authorized session, so the shared client lock is not needed
+                gmail.save_attachment(msg_id, attachment, str(folder), filename=name)
+            else:
+                with gmail_state["lock"]:
+                    gmail.save_attachment(msg_id, attachment, str(folder), filename=name)
+    return path
+
+@app.get("/api/task/{task_id}/attachments/{index}")
+async def get_attachment(task_id: str, index: int):
+    """Downloads an email attachment on first request, then serves the saved copy."""
+    msg_id = email_message_id(task_id)
+    if msg_id is None:
+        raise HTTPException(status_code=404, detail="Not an email task")
+    attachments = await run_io(message_store.attachments, msg_id)
+    if not 0 <= index < len(attachments):
+        raise HTTPException(status_code=404, detail="Attachment not found")
+    from gmail_service import attachment_filenames
+    name = attachment_filenames(attachments)[index]
+    try:
+        path = await anyio.to_thread.run_sync(
+            partial(download_attachment, msg_id, attachments[index], name), limiter=ATTACHMENT_LIMITER)
+    except Exception as e:
+        logger.error(f"Could not download attachment {name} of {msg_id}: {e}")
+        raise HTTPException(status_code=502, detail="Attachment download failed")
+    return FileResponse(path, filename=name, media_type=attachments[index].get("mime_type"))
+
+@app.get("/api/task/{task_id}")
+async def get_task_detail(task_id: str, request: Request):
+    """Returns the parsed content of a specific task."""
+    task_path = VAULT_ROOT / "Needs_Action" / task_id
+    try:
+        stat = await run_io(task_path.stat)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Task not found")
     
-    lines = log_file.read_text(encoding="utf-8").splitlines()
-    return lines[-10:] # Last 10 lines
+    # Validated from mtime and size (plus whether the email body is cached), so a 304 never reads the file
+    msg_id = email_message_id(task_id)
+    has_body = msg_id is not None and await run_io(message_store.has_body, msg_id)
+    return await conditional_json(
+        request,
+        f"task-{stat_tag(stat)}{'-body' if has_body else ''}",
+        lambda: build_task_detail(task_id, task_path),
+        last_modified=stat.st_mtime,
+        blocking=True
+    )
+
+@app.get("/api/logs")
+async def get_logs(
+    request: Request,
+    n: int = Query(10, ge=1, le=1000),
+    level: str = None,
+    file: str = "orchestrator.log",
+    follow: bool = False,
+):
+    """Returns the last n lines of a vault log, optionally filtered by level.
+
+    file is one of orchestrator.log, watcher.log, rejections.log or a
+    gmail_*.log. With follow=true the response is an event stream that
+    starts with those lines and then carries new ones as log-line events.
+    """
+    log_file = resolve_log(VAULT_ROOT / "Logs", file)
+    if log_file is None:
+        raise HTTPException(status_code=400, detail=f"Unknown log file: {file}")
+    if level and level.upper() not in LEVELS:
+        raise HTTPException(status_code=400, detail=f"level must be one of {', '.join(LEVELS)}")
+
+    match = level_matcher(level)
+    if not follow:
+        try:
+            stat = await run_io(log_file.stat)
+        except FileNotFoundError:
+            return []
+        return await conditional_json(
+            request,
+            f"logs-{stat_tag(stat)}-{query_tag(request)}",
+            lambda: tail_lines(log_file, n, match),
+            last_modified=stat.st_mtime,
+            blocking=True
+        )
+
+    lines = await run_io(lambda: tail_lines(log_file, n, match) if log_file.exists() else [])
+
+    async def log_stream():
+        for line in lines:
+            yield f"event: log-line\ndata: {json.dumps(line)}\n\n"
+        async for line in follow_lines(log_file, match, run=run_io):
+            yield f"event: log-line\ndata: {json.dumps(line)}\n\n"
+
+    return StreamingResponse(log_stream(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
 
-from pydantic import BaseModel
-from datetime import datetime
 
 class ChatMessage(BaseModel):
     message: str
@@ -175,14 +547,23 @@ class ChatMessage(BaseModel):
 async def post_chat(chat: ChatMessage):
     """Writes a chat message to the Inbox for the orchestrator to process."""
     inbox_path = VAULT_ROOT / "Inbox"
-    inbox_path.mkdir(parents=True, exist_ok=True)
     
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     file_path = inbox_path / f"CHAT_{timestamp}.txt"
     
-    try:
+    def write_message():
+        inbox_path.mkdir(parents=True, exist_ok=True)
         file_path.write_text(chat.message, encoding="utf-8")
-        return {"status": "success", "message": "Command recognized by system."}
+
+    # Parsing is cheap (first lines only); tell the user what the orchestrator will act on
+    commands = [c.name for c in command_router.parse(chat.message)]
+    try:
+        await run_io(write_message)
+        if commands:
+            message = f"Command recognized by system: {', '.join(commands)}."
+        else:
+            message = "No command recognized; the message was filed as a task."
+        return {"status": "success", "message": message, "commands": commands}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
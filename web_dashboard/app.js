@@ -1,65 +1,221 @@
 const API_BASE = "/api";
 
+function renderStats(data) {
+    document.getElementById('active-tasks').innerText = data.active_tasks;
+    document.getElementById('revenue').innerText = data.revenue;
+    document.getElementById('completed-tasks').innerText = data.completed_tasks;
+    document.getElementById('system-health').innerText = data.system_health;
+}
+
 async function fetchStats() {
     try {
         const response = await fetch(`${API_BASE}/stats`);
-        const data = await response.json();
-
-        document.getElementById('active-tasks').innerText = data.active_tasks;
-        document.getElementById('revenue').innerText = data.revenue;
-        document.getElementById('completed-tasks').innerText = data.completed_tasks;
-        document.getElementById('system-health').innerText = data.system_health;
+        renderStats(await response.json());
     } catch (error) {
         console.error("Failed to fetch stats:", error);
     }
 }
 
+const EMPTY_EMAILS = `<p class="empty-state" style="color: var(--text-dim); text-align: center; padding: 2rem;">Inbox is clear.</p>`;
+const EMPTY_TASKS = `<p class="empty-state" style="color: var(--text-dim); text-align: center; padding: 2rem;">No pending missions.</p>`;
+
+const PAGE_SIZE = 50;
+
+async function fetchTaskPage(types) {
+    const response = await fetch(`${API_BASE}/tasks?type=${types}&limit=${PAGE_SIZE}`);
+    return response.json();
+}
+
 async function fetchTasks() {
     try {
-        const response = await fetch(`${API_BASE}/tasks`);
-        const tasks = await response.json();
+        const [emails, generalTasks] = await Promise.all([
+            fetchTaskPage('email'),
+            fetchTaskPage('file,intelligent_task')
+        ]);
 
         const taskList = document.getElementById('task-list');
         const emailList = document.getElementById('email-list');
-        const emailCountBadge = document.getElementById('email-count');
 
-        const emails = tasks.filter(t => t.type === 'email');
-        const generalTasks = tasks.filter(t => t.type !== 'email');
+        emailList.innerHTML = emails.items.length ? emails.items.map(task => createTaskElement(task)).join('') : EMPTY_EMAILS;
+        taskList.innerHTML = generalTasks.items.length ? generalTasks.items.map(task => createTaskElement(task)).join('') : EMPTY_TASKS;
+        listTotals['email-list'] = emails.total;
+        listTotals['task-list'] = generalTasks.total;
+        tasksVersion = Math.min(emails.version, generalTasks.version);
+        updateEmailBadge();
+    } catch (error) {
+        console.error("Failed to fetch tasks:", error);
+    }
+}
 
-        // Update Email Section
-        if (emails.length === 0) {
-            emailList.innerHTML = `<p style="color: var(--text-dim); text-align: center; padding: 2rem;">Inbox is clear.</p>`;
-            emailCountBadge.innerText = "0 New";
-        } else {
-            emailCountBadge.innerText = `${emails.length} New`;
-            emailList.innerHTML = emails.map(task => createTaskElement(task)).join('');
-        }
+// Version of the task lists currently in the DOM; null until the first full load
+let tasksVersion = null;
 
-        // Update General Tasks Section
-        if (generalTasks.length === 0) {
-            taskList.innerHTML = `<p style="color: var(--text-dim); text-align: center; padding: 2rem;">No pending missions.</p>`;
-        } else {
-            taskList.innerHTML = generalTasks.map(task => createTaskElement(task)).join('');
-        }
+// Fetches only what changed since tasksVersion and patches the lists in place
+async function syncTasks() {
+    if (tasksVersion === null) return fetchTasks();
+    try {
+        const response = await fetch(`${API_BASE}/tasks?since=${tasksVersion}`);
+        const delta = await response.json();
+        if (delta.reset) return fetchTasks();
+
+        applyTotals(delta.totals);
+        delta.removed.forEach(removeTask);
+        delta.changed.forEach(upsertTask);
+        tasksVersion = delta.version;
     } catch (error) {
-        console.error("Failed to fetch tasks:", error);
+        console.error("Failed to sync tasks:", error);
     }
 }
 
+function applyTaskEvent(data, apply) {
+    applyTotals(data.totals);
+    apply(data);
+    if (tasksVersion !== null) tasksVersion = Math.max(tasksVersion, data.version);
+}
+
+function listFor(task) {
+    return document.getElementById(task.type === 'email' ? 'email-list' : 'task-list');
+}
+
+function findTaskNode(taskId) {
+    return document.querySelector(`.task-item[data-id="${CSS.escape(taskId)}"]`);
+}
+
+// Only the first page is rendered, so list totals always come from the server
+// (page loads, deltas and task events), never from counting rendered items
+const listTotals = { 'email-list': 0, 'task-list': 0 };
+
+function applyTotals(totals) {
+    if (!totals) return;
+    listTotals['email-list'] = totals.email;
+    listTotals['task-list'] = totals.file + totals.intelligent_task;
+    updateEmailBadge();
+}
+
+function updateEmailBadge() {
+    document.getElementById('email-count').innerText = `${listTotals['email-list']} New`;
+}
+
+// Applies a task-added or task-changed event: the task is (re)placed by time,
+// newest first, but only if it falls inside the rendered first page
+function upsertTask(task) {
+    findTaskNode(task.id)?.remove();
+    const list = listFor(task);
+    const items = [...list.querySelectorAll('.task-item')];
+    const last = items[items.length - 1];
+    // Everything fits on the page, or the task sorts before the page's last item
+    const inWindow = items.length + 1 >= listTotals[list.id] || (last && task.time > Number(last.dataset.time));
+    if (!inWindow) {
+        if (!items.length) list.innerHTML = list.id === 'email-list' ? EMPTY_EMAILS : EMPTY_TASKS;
+        return;
+    }
+
+    const template = document.createElement('template');
+    template.innerHTML = createTaskElement(task).trim();
+    list.querySelector('.empty-state')?.remove();
+    list.insertBefore(template.content.firstChild, items.find(el => Number(el.dataset.time) < task.time) || null);
+    // Keep the rendered window at one page
+    const rendered = list.querySelectorAll('.task-item');
+    for (let i = PAGE_SIZE; i < rendered.length; i++) rendered[i].remove();
+}
+
+// Applies a task-removed event
+function removeTask(taskId) {
+    if (selectedTasks.delete(taskId)) updateBulkArchive();
+    const node = findTaskNode(taskId);
+    if (!node) return;
+    const list = node.parentElement;
+    node.remove();
+    if (!list.querySelector('.task-item')) {
+        list.innerHTML = list.id === 'email-list' ? EMPTY_EMAILS : EMPTY_TASKS;
+    }
+}
+
+// Task ids, titles, senders and snippets come from mail and dropped files
+function escapeHtml(value) {
+    return String(value).replace(/[&<>"']/g, ch => ({
+        '&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;', "'": '&#39;'
+    })[ch]);
+}
+
 function createTaskElement(task) {
     return `
-        <div class="task-item" onclick="openTaskDetail('${task.id}')">
+        <div class="task-item${selectedTasks.has(task.id) ? ' selected' : ''}" data-id="${escapeHtml(task.id)}" data-time="${task.time}">
+            <input type="checkbox" class="task-select" ${selectedTasks.has(task.id) ? 'checked' : ''}>
             <div class="task-icon">${task.type === 'email' ? '📧' : '📑'}</div>
             <div class="task-info">
-                <h4>${task.title}</h4>
-                ${task.sender ? `<small style="color: var(--primary); display: block; margin-bottom: 4px;">From: ${task.sender}</small>` : ''}
-                <p>${task.snippet || 'Click to view details...'}</p>
+                <h4>${escapeHtml(task.title)}</h4>
+                ${task.sender ? `<small style="color: var(--primary); display: block; margin-bottom: 4px;">From: ${escapeHtml(task.sender)}</small>` : ''}
+                <p>${task.snippet ? escapeHtml(task.snippet) : 'Click to view details...'}</p>
                 <small>${new Date(task.time * 1000).toLocaleString()}</small>
             </div>
         </div>
     `;
 }
 
+// Multi-select archive
+const selectedTasks = new Set();
+
+function toggleTaskSelection(taskId, selected) {
+    if (selected) selectedTasks.add(taskId);
+    else selectedTasks.delete(taskId);
+    findTaskNode(taskId)?.classList.toggle('selected', selected);
+    updateBulkArchive();
+}
+
+// One click handler per list; the task id is read back from data-id, never spliced into code
+function onTaskListClick(event) {
+    const item = event.target.closest('.task-item');
+    if (!item) return;
+    if (event.target.classList.contains('task-select')) {
+        toggleTaskSelection(item.dataset.id, event.target.checked);
+    } else {
+        openTaskDetail(item.dataset.id);
+    }
+}
+
+['email-list', 'task-list'].forEach(id => document.getElementById(id).addEventListener('click', onTaskListClick));
+
+function updateBulkArchive() {
+    document.querySelectorAll('.bulk-archive').forEach(btn => {
+        btn.style.display = selectedTasks.size ? '' : 'none';
+        btn.innerText = `Archive selected (${selectedTasks.size})`;
+    });
+}
+
+async function archiveSelected() {
+    const ids = [...selectedTasks];
+    if (!ids.length) return;
+    try {
+        const response = await fetch(`${API_BASE}/tasks/complete`, {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ ids })
+        });
+        const data = await response.json();
+        if (!response.ok) {
+            alert("Failed to archive tasks: " + (data.detail || "Unknown error"));
+            return;
+        }
+        data.results.forEach(result => {
+            if (result.status === 'success') {
+                selectedTasks.delete(result.id);
+                removeTask(result.id);
+            }
+        });
+        if (data.failed) {
+            const failures = data.results.filter(r => r.status !== 'success').map(r => `${r.id}: ${r.detail}`);
+            alert(`${data.failed} task(s) could not be archived:\n` + failures.join('\n'));
+        }
+    } catch (error) {
+        console.error("Bulk archive error:", error);
+    } finally {
+        updateBulkArchive();
+    }
+}
+
+document.querySelectorAll('.bulk-archive').forEach(btn => btn.addEventListener('click', archiveSelected));
+
 const taskModal = document.getElementById('task-modal');
 const modalBody = document.getElementById('modal-body');
 const modalTitle = document.getElementById('modal-title');
@@ -70,16 +226,33 @@ const archiveBtn = document.getElementById('archive-btn');
 
 async function openTaskDetail(taskId) {
     try {
-        const response = await fetch(`${API_BASE}/task/${taskId}`);
+        const response = await fetch(`${API_BASE}/task/${encodeURIComponent(taskId)}`);
         const data = await response.json();
 
         modalTitle.innerText = data.subject || taskId;
+        // Sender and body come from the mail itself: insert them as text, never as markup
         modalBody.innerHTML = `
             <div style="margin-bottom: 1rem; padding-bottom: 1rem; border-bottom: 1px solid var(--border);">
-                <span style="color: var(--primary); font-weight: bold;">From:</span> ${data.from}<br>
+                <span style="color: var(--primary); font-weight: bold;">From:</span> <span class="email-from"></span><br>
             </div>
-            <div class="email-body-text" style="white-space: pre-wrap;">${data.body}</div>
+            <div class="email-body-text" style="white-space: pre-wrap;"></div>
         `;
+        modalBody.querySelector('.email-from').textContent = data.from;
+        modalBody.querySelector('.email-body-text').textContent = data.body;
+        if (data.attachments && data.attachments.length) {
+            // Downloaded from Gmail only when a link is clicked
+            const list = document.createElement('div');
+            list.className = 'email-attachments';
+            list.style.marginTop = '1rem';
+            for (const attachment of data.attachments) {
+                const link = document.createElement('a');
+                link.href = `${API_BASE}/task/${encodeURIComponent(taskId)}/attachments/${attachment.index}`;
+                link.textContent = `📎 ${attachment.filename} (${Math.ceil(attachment.size / 1024)} KB)`;
+                link.style.display = 'block';
+                list.appendChild(link);
+            }
+            modalBody.appendChild(list);
+        }
         taskModal.classList.add('active');
 
         const sender = data.from;
@@ -103,8 +276,8 @@ async function openTaskDetail(taskId) {
                 });
                 if (response.ok) {
                     taskModal.classList.remove('active');
-                    await fetchTasks();
-                    await fetchStats();
+                    // The event stream delivers the removal; patch locally too in case it is down
+                    removeTask(taskId);
                 } else {
                     const error = await response.json();
                     alert("Failed to archive task: " + (error.detail || "Unknown error"));
@@ -130,6 +303,8 @@ window.onclick = (event) => {
     }
 }
 
+const MAX_LOG_LINES = 10;
+
 async function fetchLogs() {
     try {
         const response = await fetch(`${API_BASE}/logs`);
@@ -149,6 +324,19 @@ async function fetchLogs() {
     }
 }
 
+function appendLogLine(line) {
+    const logFeed = document.getElementById('log-feed');
+    if (!logFeed.querySelector('.log-item')) logFeed.innerHTML = '';
+
+    const item = document.createElement('div');
+    item.className = 'log-item';
+    item.innerText = line;
+    logFeed.appendChild(item);
+
+    const items = logFeed.querySelectorAll('.log-item');
+    for (let i = 0; i < items.length - MAX_LOG_LINES; i++) items[i].remove();
+}
+
 function updateGreeting() {
     const hour = new Date().getHours();
     const greeting = document.getElementById('greeting');
@@ -190,8 +378,9 @@ async function sendChatMessage() {
         });
 
         if (response.ok) {
+            const data = await response.json();
             setTimeout(() => {
-                appendMessage('bot', "Command received. I've placed the mission in your Inbox for processing.");
+                appendMessage('bot', `${data.message} I've placed the mission in your Inbox for processing.`);
             }, 600);
         } else {
             appendMessage('bot', "Sorry, I had trouble communicating with the backend.");
@@ -215,15 +404,31 @@ chatInput.addEventListener('keypress', (e) => {
     if (e.key === 'Enter') sendChatMessage();
 });
 
-// Initial fetch
-fetchStats();
-fetchTasks();
-fetchLogs();
-updateGreeting();
-
-// Refresh every 5 seconds
-setInterval(() => {
+function refreshAll() {
     fetchStats();
-    fetchTasks();
+    syncTasks();
     fetchLogs();
-}, 5000);
+}
+
+// Live updates: the server pushes deltas; on (re)connect we catch up with a delta sync
+function connectEvents() {
+    const source = new EventSource(`${API_BASE}/events`);
+
+    source.addEventListener('open', refreshAll);
+    source.addEventListener('resync', refreshAll);
+    source.addEventListener('task-added', e => applyTaskEvent(JSON.parse(e.data), upsertTask));
+    source.addEventListener('task-changed', e => applyTaskEvent(JSON.parse(e.data), upsertTask));
+    source.addEventListener('task-removed', e => applyTaskEvent(JSON.parse(e.data), data => removeTask(data.id)));
+    source.addEventListener('stats-changed', e => renderStats(JSON.parse(e.data)));
+    source.addEventListener('log-line', e => appendLogLine(JSON.parse(e.data)));
+}
+
+updateGreeting();
+
+if (window.EventSource) {
+    connectEvents();
+} else {
+    // Old browsers: fall back to polling every 5 seconds
+    refreshAll();
+    setInterval(refreshAll, 5000);
+}
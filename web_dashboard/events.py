@@ -0,0 +1,102 @@
+"""
+Server-push plumbing for the dashboard.
+Watchdog threads publish vault changes here; each connected client
+holds an asyncio queue that the /api/events stream drains.
+"""
+
+import asyncio
+import logging
+import threading
+from pathlib import Path
+from watchdog.events import FileSystemEventHandler
+
+from log_tail import LogReader
+
+logger = logging.getLogger("Events")
+
+
+class EventBroker:
+    """Fan-out of (event, data) pairs from any thread to async subscribers."""
+
+    def __init__(self, queue_size: int = 1000):
+        self.queue_size = queue_size
+        self._subscribers = set()
+        self._loop = None
+
+    def bind(self, loop):
+        self._loop = loop
+
+    def subscribe(self):
+        queue = asyncio.Queue(maxsize=self.queue_size)
+        self._subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, queue):
+        self._subscribers.discard(queue)
+
+    def publish(self, event: str, data):
+        """Thread-safe: schedules delivery on the event loop."""
+        if self._loop is None or not self._subscribers:
+            return
+        try:
+            self._loop.call_soon_threadsafe(self._dispatch, event, data)
+        except RuntimeError:
+            # Loop already closed during shutdown
+            pass
+
+    def _dispatch(self, event, data):
+        for queue in list(self._subscribers):
+            try:
+                queue.put_nowait((event, data))
+            except asyncio.QueueFull:
+                # Slow client: drop its backlog and ask it to refetch everything
+                while not queue.empty():
+                    queue.get_nowait()
+                queue.put_nowait(("resync", {}))
+
+
+class LogFollower(FileSystemEventHandler):
+    """Publishes lines appended to a log file as log-line events."""
+
+    def __init__(self, log_file: Path, broker: EventBroker):
+        self.log_file = log_file
+        self.broker = broker
+        self._reader = LogReader(log_file)
+        self._lock = threading.Lock()
+
+    def on_modified(self, event):
+        if not event.is_directory and Path(event.src_path) == self.log_file:
+            self._read_new_lines()
+
+    def on_created(self, event):
+        self.on_modified(event)
+
+    def _read_new_lines(self):
+        with self._lock:
+            try:
+                lines = self._reader.read_new()
+            except OSError as e:
+                logger.warning(f"Could not follow {self.log_file.name}: {e}")
+                return
+        for line in lines:
+            self.broker.publish("log-line", line)
+
+
+class FileWatch(FileSystemEventHandler):
+    """Calls callback() when files in a watched folder are created, changed, moved or deleted."""
+
+    CHANGE_EVENTS = ("created", "modified", "moved", "deleted")
+
+    def __init__(self, callback, names=None):
+        self.callback = callback
+        self.names = set(names) if names else None
+
+    def on_any_event(self, event):
+        if event.is_directory or event.event_type not in self.CHANGE_EVENTS:
+            return
+        paths = [event.src_path, getattr(event, "dest_path", "")]
+        if self.names is None or any(Path(p).name in self.names for p in paths if p):
+            try:
+                self.callback()
+            except Exception as e:
+                logger.error(f"File watch callback failed: {e}")
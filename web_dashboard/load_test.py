@@ -0,0 +1,139 @@
+"""
+Load test for the dashboard API.
+Measures /api/ping latency on its own and again while other clients
+hammer /api/tasks, task details and logs. If vault I/O blocks the event
+loop, the ping p99 under load climbs with the vault size; it should stay flat.
+
+Usage:
+    python load_test.py --tasks 20000          # synthetic vault, local server
+    python load_test.py --url http://host:8000  # existing server
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+import threading
+import subprocess
+import statistics
+import urllib.request
+from pathlib import Path
+
+
+def make_vault(root: Path, count: int):
+    """Writes count synthetic email tasks into root/Needs_Action."""
+    needs_action = root / "Needs_Action"
+    needs_action.mkdir(parents=True)
+    for folder in ("Done", "Logs", "Inbox"):
+        (root / folder).mkdir()
+    body = "Lorem ipsum dolor sit amet. " * 200
+    for i in range(count):
+        (needs_action / f"EMAIL_{i:08x}.md").write_text(
+            f"---\ntype: email\nfrom: Sender {i} <s{i}@example.com>\nsubject: Load test {i}\n"
+            f"priority: {random.choice(['high', 'normal'])}\nstatus: pending\n---\n\n## Email Content\n{body}\n",
+            encoding="utf-8"
+        )
+    with open(root / "Logs" / "orchestrator.log", "w", encoding="utf-8") as f:
+        for i in range(200000):
+            f.write(f"2026-01-01 00:00:00,000 - Orchestrator - INFO - line {i}\n")
+
+
+def get(url):
+    start = time.perf_counter()
+    with urllib.request.urlopen(url, timeout=30) as response:
+        body = response.read()
+    return time.perf_counter() - start, body
+
+
+def percentile(samples, p):
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(len(samples) * p))]
+
+
+def measure_ping(base_url, seconds):
+    samples = []
+    deadline = time.time() + seconds
+    while time.time() < deadline:
+        elapsed, _ = get(f"{base_url}/api/ping")
+        samples.append(elapsed * 1000)
+        time.sleep(0.01)
+    return samples
+
+
+def hammer(base_url, stop: threading.Event, task_ids):
+    urls = [f"{base_url}/api/tasks?limit=500", f"{base_url}/api/logs?n=200", f"{base_url}/api/stats"]
+    while not stop.is_set():
+        url = random.choice(urls)
+        if task_ids and random.random() < 0.5:
+            url = f"{base_url}/api/task/{random.choice(task_ids)}"
+        try:
+            get(url)
+        except Exception:
+            pass
+
+
+def report(label, samples):
+    print(f"{label:<14} n={len(samples):<5} p50={statistics.median(samples):7.2f}ms "
+          f"p99={percentile(samples, 0.99):7.2f}ms max={max(samples):7.2f}ms")
+
+
+def run(base_url, clients, seconds):
+    _, body = get(f"{base_url}/api/tasks?limit=500")
+    task_ids = [t["id"] for t in json.loads(body)["items"]]
+
+    report("idle", measure_ping(base_url, seconds))
+
+    stop = threading.Event()
+    workers = [threading.Thread(target=hammer, args=(base_url, stop, task_ids), daemon=True) for _ in range(clients)]
+    for w in workers:
+        w.start()
+    try:
+        report("under load", measure_ping(base_url, seconds))
+    finally:
+        stop.set()
+        for w in workers:
+            w.join()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", help="Test an already running server instead of starting one")
+    parser.add_argument("--tasks", type=int, default=20000, help="Synthetic vault size")
+    parser.add_argument("--clients", type=int, default=16, help="Concurrent load clients")
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--port", type=int, default=8123)
+    args = parser.parse_args()
+
+    if args.url:
+        run(args.url.rstrip("/"), args.clients, args.seconds)
+        return
+
+    with tempfile.TemporaryDirectory() as tmp:
+        vault = Path(tmp)
+        print(f"Building synthetic vault with {args.tasks} tasks...")
+        make_vault(vault, args.tasks)
+
+        env = dict(os.environ, VAULT_ROOT=str(vault))
+        server = subprocess.Popen(
+            [sys.executable, "-m", "uvicorn", "api:app", "--port", str(args.port), "--log-level", "warning"],
+            cwd=Path(__file__).parent, env=env
+        )
+        base_url = f"http://127.0.0.1:{args.port}"
+        try:
+            for _ in range(600):
+                try:
+                    get(f"{base_url}/api/ping")
+                    break
+                except Exception:
+                    time.sleep(0.1)
+            run(base_url, args.clients, args.seconds)
+        finally:
+            server.terminate()
+            server.wait()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Constant-cost access to the vault's log files.
+tail_lines seeks backwards from the end in fixed-size blocks, and
+LogReader picks up whatever was appended since the last read, so neither
+depends on how large the log has grown.
+"""
+
+import os
+import re
+import asyncio
+import fnmatch
+from pathlib import Path
+
+LOG_NAMES = ("orchestrator.log", "watcher.log", "rejections.log")
+LOG_PATTERNS = ("gmail_*.log",)
+LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR", "CRITICAL")
+
+BLOCK_SIZE = 8192
+# Upper bound on how far back a filtered tail will look for matches
+MAX_SCAN_BYTES = 4 * 1024 * 1024
+
+
+def resolve_log(logs_path: Path, name: str):
+    """Maps a requested log name onto a file in Logs, or None if not allowed."""
+    if os.path.basename(name) != name:
+        return None
+    if name in LOG_NAMES or any(fnmatch.fnmatch(name, p) for p in LOG_PATTERNS):
+        return logs_path / name
+    return None
+
+
+def level_matcher(level: str):
+    """Returns a predicate for lines at the given level, or None for all lines."""
+    if not level:
+        return None
+    pattern = re.compile(rf"\b{re.escape(level.upper())}\b")
+    return lambda line: bool(pattern.search(line))
+
+
+def tail_lines(path: Path, n: int, match=None, block_size=BLOCK_SIZE, max_scan=MAX_SCAN_BYTES):
+    """Last n lines of path (optionally only those passing match), oldest first."""
+    lines = []
+    with open(path, "rb") as f:
+        f.seek(0, os.SEEK_END)
+        position = f.tell()
+        scanned = 0
+        remainder = b""
+
+        while position > 0 and len(lines) < n and scanned < max_scan:
+            read_size = min(block_size, position)
+            position -= read_size
+            f.seek(position)
+            block = f.read(read_size) + remainder
+            scanned += read_size
+
+            parts = block.split(b"\n")
+            # The first part may be cut mid-line; keep it for the next block
+            remainder = parts[0] if position > 0 else b""
+            complete = parts[1:] if position > 0 else parts
+            for raw in reversed(complete):
+                line = raw.decode("utf-8", errors="replace").rstrip("\r")
+                if line and (match is None or match(line)):
+                    lines.append(line)
+                    if len(lines) == n:
+                        break
+
+    lines.reverse()
+    return lines
+
+
+class LogReader:
+    """Incremental reader returning complete lines appended since the last call."""
+
+    def __init__(self, path: Path, from_end: bool = True):
+        self.path = path
+        self.offset = path.stat().st_size if from_end and path.exists() else 0
+        self._pending = b""
+
+    def read_new(self, max_bytes=MAX_SCAN_BYTES):
+        try:
+            size = self.path.stat().st_size
+        except FileNotFoundError:
+            return []
+        if size < self.offset:
+            # Truncated or rotated
+            self.offset = 0
+            self._pending = b""
+        if size == self.offset:
+            return []
+
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            chunk = f.read(min(size - self.offset, max_bytes))
+        self.offset += len(chunk)
+
+        *lines, self._pending = (self._pending + chunk).split(b"\n")
+        return [text for text in (l.decode("utf-8", errors="replace").rstrip("\r") for l in lines) if text]
+
+
+async def follow_lines(path: Path, match=None, interval=0.5, run=asyncio.to_thread):
+    """Async generator yielding lines as they are appended to path.
+
+    Reads go through run (a coroutine function like asyncio.to_thread) so
+    they never block the event loop.
+    """
+    reader = await run(LogReader, path)
+    while True:
+        for line in await run(reader.read_new):
+            if match is None or match(line):
+                yield line
+        await asyncio.sleep(interval)
@@ -0,0 +1,196 @@
+"""
+Full-text search over Needs_Action, Done and the rejected archive.
+Backed by an SQLite FTS5 table (an on-disk inverted index) under Logs,
+kept current from watchdog events and reconciled by stat at startup, so
+queries never open the vault files themselves.
+"""
+
+import os
+import re
+import shlex
+import sqlite3
+import logging
+import threading
+from pathlib import Path
+from watchdog.events import FileSystemEventHandler
+
+from vault_document import split_document
+
+logger = logging.getLogger("SearchIndex")
+
+# Files whose content is indexed; anything else is searchable by name only
+TEXT_SUFFIXES = {".md", ".txt", ".csv", ".json", ".log"}
+MAX_INDEXED_BYTES = 1024 * 1024
+
+# Query prefixes users can type, mapped to FTS columns
+FIELDS = {"from": "sender", "subject": "subject", "type": "type", "priority": "priority",
+          "folder": "folder", "name": "name"}
+
+
+def read_document(path: Path):
+    """Returns (header fields, body) for indexing; body is capped at MAX_INDEXED_BYTES."""
+    if path.suffix.lower() not in TEXT_SUFFIXES:
+        return {}, ""
+    with open(path, "rb") as f:
+        text = f.read(MAX_INDEXED_BYTES).decode("utf-8", errors="replace")
+    return split_document(text)
+
+
+class SearchIndex(FileSystemEventHandler):
+    """Persisted inverted index of vault documents."""
+
+    def __init__(self, vault_path: Path, folders, db_path: Path = None):
+        self.vault_path = vault_path
+        self.folders = [vault_path / f for f in folders]
+        self.db_path = db_path or vault_path / "Logs" / "search_index.db"
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        with self._connect() as conn:
+            conn.execute("""CREATE TABLE IF NOT EXISTS docs (
+                id INTEGER PRIMARY KEY, path TEXT UNIQUE NOT NULL, mtime_ns INTEGER, size INTEGER)""")
+            conn.execute("""CREATE VIRTUAL TABLE IF NOT EXISTS docs_fts USING fts5(
+                name, folder, sender, subject, type, priority, body, tokenize='unicode61')""")
+
+    def _connect(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=10)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def schedule(self, observer):
+        for folder in self.folders:
+            folder.mkdir(parents=True, exist_ok=True)
+            observer.schedule(self, str(folder), recursive=False)
+
+    def _key(self, path: Path):
+        return path.relative_to(self.vault_path).as_posix()
+
+    def _watched(self, path: Path):
+        return path.parent in self.folders
+
+    def reconcile(self):
+        """Brings the index in line with the folders, reading only files whose stat changed."""
+        conn = self._connect()
+        known = {path: (mtime_ns, size) for path, mtime_ns, size in
+                 conn.execute("SELECT path, mtime_ns, size FROM docs")}
+        seen = set()
+        updated = 0
+        for folder in self.folders:
+            if not folder.exists():
+                continue
+            with os.scandir(folder) as entries:
+                for entry in entries:
+                    if not entry.is_file():
+                        continue
+                    path = Path(entry.path)
+                    key = self._key(path)
+                    seen.add(key)
+                    stat = entry.stat()
+                    if known.get(key) != (stat.st_mtime_ns, stat.st_size):
+                        self.upsert(path)
+                        updated += 1
+        stale = [key for key in known if key not in seen]
+        for key in stale:
+            self._delete_key(key)
+        logger.info(f"Search index reconciled: {updated} updated, {len(stale)} removed, {len(seen)} documents")
+
+    def upsert(self, path: Path):
+        try:
+            stat = path.stat()
+            fields, body = read_document(path)
+        except FileNotFoundError:
+            self.delete(path)
+            return
+        except OSError as e:
+            logger.warning(f"Could not index {path.name}: {e}")
+            return
+
+        key = self._key(path)
+        with self._write_lock, self._connect() as conn:
+            row = conn.execute("SELECT id, mtime_ns, size FROM docs WHERE path = ?", (key,)).fetchone()
+            if row and (row[1], row[2]) == (stat.st_mtime_ns, stat.st_size):
+                return
+            if row:
+                doc_id = row[0]
+                conn.execute("UPDATE docs SET mtime_ns = ?, size = ? WHERE id = ?", (stat.st_mtime_ns, stat.st_size, doc_id))
+                conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (doc_id,))
+            else:
+                doc_id = conn.execute("INSERT INTO docs (path, mtime_ns, size) VALUES (?, ?, ?)",
+                                      (key, stat.st_mtime_ns, stat.st_size)).lastrowid
+            conn.execute(
+                "INSERT INTO docs_fts (rowid, name, folder, sender, subject, type, priority, body) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, path.name, path.parent.name, fields.get("from", ""), fields.get("subject", ""),
+                 fields.get("type", ""), fields.get("priority", ""), body)
+            )
+
+    def delete(self, path: Path):
+        self._delete_key(self._key(path))
+
+    def _delete_key(self, key: str):
+        with self._write_lock, self._connect() as conn:
+            row = conn.execute("SELECT id FROM docs WHERE path = ?", (key,)).fetchone()
+            if row:
+                conn.execute("DELETE FROM docs_fts WHERE rowid = ?", (row[0],))
+                conn.execute("DELETE FROM docs WHERE id = ?", (row[0],))
+
+    def search(self, query: str, limit: int = 20):
+        """Ranked matches for query. Terms are prefix-matched; field:value restricts a column."""
+        match = build_match(query)
+        if not match:
+            return []
+        rows = self._connect().execute(
+            """SELECT d.path, f.folder, f.name, f.sender, f.subject, f.type, f.priority,
+                      snippet(docs_fts, 6, '[', ']', '…', 12)
+               FROM docs_fts f JOIN docs d ON d.id = f.rowid
+               WHERE docs_fts MATCH ? ORDER BY bm25(docs_fts) LIMIT ?""",
+            (match, limit)
+        ).fetchall()
+        keys = ("path", "folder", "name", "from", "subject", "type", "priority", "snippet")
+        return [dict(zip(keys, row)) for row in rows]
+
+    def on_created(self, event):
+        if not event.is_directory and self._watched(Path(event.src_path)):
+            self.upsert(Path(event.src_path))
+
+    def on_modified(self, event):
+        self.on_created(event)
+
+    def on_deleted(self, event):
+        if not event.is_directory and self._watched(Path(event.src_path)):
+            self.delete(Path(event.src_path))
+
+    def on_moved(self, event):
+        if event.is_directory:
+            return
+        if self._watched(Path(event.src_path)):
+            self.delete(Path(event.src_path))
+        if self._watched(Path(event.dest_path)):
+            self.upsert(Path(event.dest_path))
+
+
+def build_match(query: str):
+    """Translates a user query into an FTS5 MATCH expression.
+
+    Every term is quoted, so user input can never be FTS syntax:
+    'from:alice invoice "due date"' -> 'sender:"alice"* "invoice"* "due date"'
+    """
+    try:
+        tokens = shlex.split(query)
+    except ValueError:
+        tokens = query.split()
+
+    parts = []
+    for token in tokens:
+        field, sep, value = token.partition(":")
+        column = FIELDS.get(field.lower()) if sep else None
+        term = value if column else token
+        term = re.sub(r"\s+", " ", term).strip().replace('"', '""')
+        if not term:
+            continue
+        phrase = f'"{term}"' if " " in term else f'"{term}"*'
+        parts.append(f"{column}:{phrase}" if column else phrase)
+    return " ".join(parts)
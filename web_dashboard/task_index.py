@@ -0,0 +1,378 @@
+"""
+Resident index of pending tasks in Needs_Action.
+Built once at startup and kept current by a watchdog observer, so the
+dashboard API can answer from memory without touching the disk.
+"""
+
+import os
+import json
+import base64
+import heapq
+import bisect
+import logging
+import time
+import threading
+from collections import Counter, deque
+from itertools import islice
+from pathlib import Path
+from watchdog.events import FileSystemEventHandler
+
+from vault_document import read_header
+
+logger = logging.getLogger("TaskIndex")
+
+TASK_TYPES = ("email", "file", "intelligent_task")
+PRIORITIES = ("high", "medium", "normal", "low")
+PRIORITY_RANK = {p: i for i, p in enumerate(PRIORITIES)}
+
+# Sort key builders; the task id is always last so keys are unique
+SORT_KEYS = {
+    "time": lambda t: (t["time"], t["id"]),
+    "title": lambda t: (t["title"].lower(), t["id"]),
+    "priority": lambda t: (PRIORITY_RANK[t["priority"]], -t["time"], t["id"]),
+}
+
+# Value types of each sort key, checked when a cursor is decoded
+KEY_TYPES = {
+    "time": ((int, float), str),
+    "title": (str, str),
+    "priority": (int, (int, float), str),
+}
+
+# Partitions of each ordering: one per (type, priority) pair
+PARTITIONS = [(t, p) for t in TASK_TYPES for p in PRIORITIES]
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def normalize_priority(value: str):
+    """Map frontmatter values like '🔴 HIGH' or 'high' onto PRIORITIES."""
+    value = value.lower()
+    for priority in PRIORITIES:
+        if priority in value:
+            return priority
+    return "normal"
+
+
+def parse_task(file: Path):
+    """Parse a task markdown file into the summary shown in listings.
+
+    Only the header and first body lines are read (see vault_document), so
+    listing never loads a full email body.
+    """
+    stat = file.stat()
+    doc = read_header(file, stat)
+    fields = doc["fields"]
+
+    if "EMAIL" in file.name:
+        task_type = "email"
+    elif fields.get("type") == "intelligent_task":
+        task_type = "intelligent_task"
+    else:
+        task_type = "file"
+
+    return {
+        "id": file.name,
+        "title": doc["title"] or fields.get("subject") or file.name,
+        "snippet": doc["first_line"][:100],
+        "sender": fields.get("from", ""),
+        "time": stat.st_mtime,
+        "type": task_type,
+        "priority": normalize_priority(fields.get("priority", ""))
+    }
+
+
+def encode_cursor(sort: str, key: tuple):
+    raw = json.dumps({"s": sort, "k": list(key)}).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def decode_cursor(cursor: str, sort: str):
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        key = tuple(data["k"])
+    except Exception:
+        raise InvalidCursor("Malformed cursor")
+    if data.get("s") != sort:
+        raise InvalidCursor("Cursor was issued for a different sort order")
+    # Keys are compared against the index's keys; values of another type would fail in bisect
+    shape = KEY_TYPES[sort]
+    if len(key) != len(shape) or any(isinstance(v, bool) or not isinstance(v, t) for v, t in zip(key, shape)):
+        raise InvalidCursor("Malformed cursor")
+    return key
+
+
+def _run(keys, after, descending):
+    """Keys of one sorted partition strictly past the cursor, in page order."""
+    if descending:
+        start = bisect.bisect_left(keys, after) if after else len(keys)
+        return (keys[i] for i in range(start - 1, -1, -1))
+    start = bisect.bisect_right(keys, after) if after else 0
+    return (keys[i] for i in range(start, len(keys)))
+
+
+class TaskIndex(FileSystemEventHandler):
+    """In-memory view of Needs_Action/*.md, invalidated by filesystem events.
+
+    For every sort key the index keeps one pre-sorted list of keys over all
+    tasks plus one per (type, priority) pair. A filtered page bisects the
+    matching partitions and merges them lazily, so it costs a few bisects
+    and a walk of the page, whatever the filter.
+
+    The index also tracks every file in the folder by name prefix, so the
+    files related to a task (the same stem with any extension, as a
+    "{stem}.*" glob would find) are a dictionary lookup rather than a scan.
+
+    Every change bumps a version number and is appended to a bounded change
+    log, which is what delta sync (changes_since) replays. Versions start
+    from the wall clock in microseconds so they keep increasing across
+    restarts; a client holding a version from before the current build or
+    older than the retained log is told to reset.
+    """
+
+    def __init__(self, folder: Path, log_size: int = 10000):
+        self.folder = folder
+        self.version = 0
+        self._base_version = 0
+        self._changes = deque(maxlen=log_size)
+        self._tasks = {}
+        self._related = {}
+        self._orders = {}
+        self._counts = Counter()
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._reset_orders()
+
+    def _reset_orders(self):
+        self._orders = {sort: {part: [] for part in ["all"] + PARTITIONS} for sort in SORT_KEYS}
+        self._counts = Counter()
+
+    def build(self):
+        """Full scan of the folder. Called once at startup."""
+        tasks = {}
+        names = []
+        if self.folder.exists():
+            with os.scandir(self.folder) as entries:
+                names = [e.name for e in entries if e.is_file()]
+            for name in names:
+                if not name.endswith(".md"):
+                    continue
+                try:
+                    tasks[name] = parse_task(self.folder / name)
+                except Exception:
+                    continue
+        with self._lock:
+            self._related = {}
+            for name in names:
+                self._add_file(name)
+            self._base_version = max(time.time_ns() // 1000, self.version + 1)
+            self.version = self._base_version
+            self._changes.clear()
+            self._tasks = tasks
+            self._reset_orders()
+            for sort, make_key in SORT_KEYS.items():
+                for task in tasks.values():
+                    key = make_key(task)
+                    self._orders[sort]["all"].append(key)
+                    self._orders[sort][(task["type"], task["priority"])].append(key)
+                for keys in self._orders[sort].values():
+                    keys.sort()
+            self._counts.update((t["type"], t["priority"]) for t in tasks.values())
+        logger.info(f"Indexed {len(tasks)} tasks in {self.folder}")
+
+    def schedule(self, observer):
+        """Build the index and register for change events on the observer."""
+        self.folder.mkdir(parents=True, exist_ok=True)
+        self.build()
+        observer.schedule(self, str(self.folder), recursive=False)
+
+    def add_listener(self, callback):
+        """callback(event, data, version) is called with task-added, task-changed and task-removed."""
+        self._listeners.append(callback)
+
+    def _notify(self, event, data, version):
+        for callback in self._listeners:
+            try:
+                callback(event, data, version)
+            except Exception as e:
+                logger.error(f"Task listener failed: {e}")
+
+    def page(self, limit=50, cursor=None, sort="time", descending=True, types=None, priorities=None):
+        """Returns (tasks, next_cursor) for one page of the requested ordering."""
+        if sort not in SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {sort}")
+        after = decode_cursor(cursor, sort) if cursor else None
+        types = set(types) if types else None
+        priorities = set(priorities) if priorities else None
+
+        with self._lock:
+            orders = self._orders[sort]
+            if types or priorities:
+                parts = [orders[(t, p)] for t, p in PARTITIONS
+                         if (not types or t in types) and (not priorities or p in priorities)]
+            else:
+                parts = [orders["all"]]
+
+            # Each partition from the cursor on, merged into one ordering
+            runs = [_run(keys, after, descending) for keys in parts]
+            merged = heapq.merge(*runs, reverse=True) if descending else heapq.merge(*runs)
+
+            keys = list(islice(merged, limit + 1))
+            has_more = len(keys) > limit
+            keys = keys[:limit]
+            items = [self._tasks[key[-1]] for key in keys]
+            last_key = keys[-1] if keys else None
+
+        next_cursor = encode_cursor(sort, last_key) if has_more else None
+        return items, next_cursor
+
+    def changes_since(self, since: int):
+        """Returns (changed_tasks, removed_ids, version), or None if the client must reset."""
+        with self._lock:
+            oldest = self._changes[0][0] if self._changes else self.version + 1
+            if since < self._base_version or since > self.version or since < oldest - 1:
+                return None
+
+            seen = set()
+            for version, task_id in reversed(self._changes):
+                if version <= since:
+                    break
+                seen.add(task_id)
+
+            changed = [self._tasks[i] for i in seen if i in self._tasks]
+            removed = [i for i in seen if i not in self._tasks]
+            return changed, removed, self.version
+
+    def _record(self, task_id):
+        """Bump the version for a change to task_id. Caller holds the lock."""
+        self.version += 1
+        self._changes.append((self.version, task_id))
+        return self.version
+
+    def total(self, types=None, priorities=None):
+        """Number of tasks matching the filters, from per (type, priority) counts."""
+        with self._lock:
+            return sum(n for (t, p), n in self._counts.items()
+                       if (not types or t in types) and (not priorities or p in priorities))
+
+    def type_totals(self):
+        """Number of tasks of each type."""
+        with self._lock:
+            totals = dict.fromkeys(TASK_TYPES, 0)
+            for (t, _), n in self._counts.items():
+                totals[t] += n
+            return totals
+
+    def count(self):
+        with self._lock:
+            return len(self._tasks)
+
+    def related_files(self, task_id: str):
+        """Names of the files sharing task_id's stem, task_id included if present."""
+        stem = Path(task_id).stem
+        with self._lock:
+            return set(self._related.get(stem, ()))
+
+    @staticmethod
+    def _prefixes(name: str):
+        # Every prefix that ends right before a dot: a.b.md -> a, a.b
+        i = name.find(".", 1)
+        while i != -1:
+            yield name[:i]
+            i = name.find(".", i + 1)
+
+    def _add_file(self, name: str):
+        for prefix in self._prefixes(name):
+            self._related.setdefault(prefix, set()).add(name)
+
+    def _discard_file(self, name: str):
+        for prefix in self._prefixes(name):
+            names = self._related.get(prefix)
+            if names:
+                names.discard(name)
+                if not names:
+                    del self._related[prefix]
+
+    def _track_file(self, path: Path, present: bool):
+        if path.parent != self.folder:
+            return
+        with self._lock:
+            if present:
+                self._add_file(path.name)
+            else:
+                self._discard_file(path.name)
+
+    def _insert(self, task):
+        for sort, make_key in SORT_KEYS.items():
+            key = make_key(task)
+            bisect.insort(self._orders[sort]["all"], key)
+            bisect.insort(self._orders[sort][(task["type"], task["priority"])], key)
+        self._counts[(task["type"], task["priority"])] += 1
+
+    def _discard(self, task):
+        for sort, make_key in SORT_KEYS.items():
+            key = make_key(task)
+            for keys in (self._orders[sort]["all"], self._orders[sort][(task["type"], task["priority"])]):
+                i = bisect.bisect_left(keys, key)
+                if i < len(keys) and keys[i] == key:
+                    del keys[i]
+        self._counts[(task["type"], task["priority"])] -= 1
+
+    def _is_task(self, path: Path):
+        return path.suffix == ".md" and path.parent == self.folder
+
+    def _refresh(self, path: Path):
+        if not self._is_task(path):
+            return
+        try:
+            task = parse_task(path)
+        except FileNotFoundError:
+            self._remove(path)
+            return
+        except Exception as e:
+            logger.warning(f"Could not index {path.name}: {e}")
+            return
+        with self._lock:
+            old = self._tasks.get(path.name)
+            if old == task:
+                return
+            if old:
+                self._discard(old)
+            self._tasks[path.name] = task
+            self._insert(task)
+            version = self._record(path.name)
+        self._notify("task-changed" if old else "task-added", task, version)
+
+    def _remove(self, path: Path):
+        if not self._is_task(path):
+            return
+        with self._lock:
+            old = self._tasks.pop(path.name, None)
+            if old is None:
+                return
+            self._discard(old)
+            version = self._record(path.name)
+        self._notify("task-removed", {"id": path.name}, version)
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self._track_file(Path(event.src_path), True)
+            self._refresh(Path(event.src_path))
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self._refresh(Path(event.src_path))
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self._track_file(Path(event.src_path), False)
+            self._remove(Path(event.src_path))
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self._track_file(Path(event.src_path), False)
+            self._track_file(Path(event.dest_path), True)
+            self._remove(Path(event.src_path))
+            self._refresh(Path(event.dest_path))